@@ -1,45 +1,112 @@
 import os
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+import json
+import time
+import sqlite3
+import uuid
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, stream_with_context, g
 from dotenv import load_dotenv
 from datetime import datetime
 
 # Internal Project Modules
-from src.retriever import MedicalRAGRetriever
-from src.ai_engine import MedicalAIEngine
-from src.appointment_manager import apt_manager
+from src.appointment_listing import apt_listing, row_to_dict
 from src.database_manager import db_manager
-from src.embeddings import MedicalEmbeddingManager
-from src.vector_store import MedicalVectorManager
-from src.logger import logger
+from src.doctor_directory import doctor_directory, doctor_to_dict
+from src.triage import symptom_triage
+from src.slot_engine import slot_engine
+from src.write_queue import write_queue
+from src.counters import ai_query_counter, get_dashboard_counts
+from src.services import services
+from src.metrics import metrics
+from src.logger import logger, set_request_id, dropped_records
 
 load_dotenv()
 app = Flask(__name__)
 
 # --- HMS System Initialization ---
-try:
-    embed_manager = MedicalEmbeddingManager()
-    embeddings = embed_manager.get_embeddings()
-    vstore_manager = MedicalVectorManager(embedding_model=embeddings)
-    vectorstore = vstore_manager.get_vectorstore_object()
-    retriever = MedicalRAGRetriever(vectorstore)
-    ai_brain = MedicalAIEngine()
-    logger.info("✅ HMS Systems Online.")
-except Exception as e:
-    logger.critical(f"❌ Boot Failure: {str(e)}")
+# Models, Pinecone and Groq are built lazily by the service registry on first
+# use; by default they are warmed up in the background so non-AI pages serve
+# immediately. SERVICES_WARMUP=0 disables the warm-up (scripts, tests).
+if os.getenv("SERVICES_WARMUP", "1") != "0":
+    services.warm_up()
+
+# --- Request metrics ---
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    # Honour an upstream proxy's ID so log lines correlate across hops
+    g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+    set_request_id(g.request_id)
+
+@app.after_request
+def _record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    # For streamed responses this is time to headers; the stream itself is timed per stage
+    metrics.observe("http_request_seconds", time.perf_counter() - g.request_start, endpoint=endpoint)
+    metrics.inc("http_responses_total", endpoint=endpoint, status=str(response.status_code))
+    response.headers["X-Request-ID"] = g.request_id
+    return response
+
+def _service_gauges():
+    """Cache and coalescing ratios, read from the services at scrape time."""
+    for name, status in services.status().items():
+        yield "service_ready", {"service": name}, int(status["ready"])
+    if services.is_ready("answer_cache"):
+        stats = services.get("answer_cache").stats()
+        yield "answer_cache_hit_ratio", {}, stats["hit_ratio"]
+        yield "answer_cache_entries", {}, stats["entries"]
+    if services.is_ready("embeddings") and hasattr(services.get("embeddings"), "stats"):
+        stats = services.get("embeddings").stats()
+        yield "embedding_cache_hit_ratio", {"kind": "query"}, stats["query_hit_ratio"]
+        yield "embedding_cache_hit_ratio", {"kind": "doc"}, stats["doc_hit_ratio"]
+    if services.is_ready("ai_brain"):
+        ai_brain = services.get("ai_brain")
+        flights = ai_brain.single_flight.stats()
+        yield "llm_coalescing_rate", {}, flights["coalescing_rate"]
+        yield "llm_coalesced_calls", {}, flights["followers"]
+        yield "llm_prompt_tokens", {}, ai_brain.usage["prompt_tokens"]
+        for model, state in ai_brain.llm.stats()["models"].items():
+            yield "llm_circuit_open", {"model": model}, int(state != "closed")
+    for method, count in symptom_triage.stats.items():
+        yield "triage_decisions", {"method": method}, count
+    yield "log_records_dropped", {}, dropped_records()
+
+metrics.add_collector(_service_gauges)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition: stage latency histograms + p50/p95/p99, errors, cache ratios."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 # --- UI ROUTES ---
 
+@app.route('/healthz')
+def healthz():
+    """Readiness probe: 200 once the database and every AI service are up, else 503."""
+    service_status = services.status()
+    try:
+        db_manager.fetch_one("SELECT 1")
+        database = "ok"
+    except Exception as e:
+        database = str(e)
+
+    ready = database == "ok" and services.ready()
+    if ready:
+        state = "ready"
+    elif any(s["error"] for s in service_status.values()) or database != "ok":
+        state = "degraded"
+    else:
+        state = "starting"
+    return jsonify({"status": state, "database": database, "services": service_status}), (200 if ready else 503)
+
 @app.route('/')
 def dashboard_page():
-    # Database se real counts lena
-    db_manager.cursor.execute("SELECT COUNT(*) FROM appointments")
-    total_apt = db_manager.cursor.fetchone()[0]
+    # Trigger-maintained counts (O(1)) aur AI queries memory se
+    counts = get_dashboard_counts()
+    total_apt = counts.get('appointments', 0)
+    total_doc = counts.get('doctors', 0)
     
-    db_manager.cursor.execute("SELECT COUNT(*) FROM doctors")
-    total_doc = db_manager.cursor.fetchone()[0]
-    
-    # AI Queries count (Yahan 150 ki jagah 0 rakhein agar table nahi hai)
-    ai_count = 150 
+    ai_count = ai_query_counter.today()
     
     return render_template('dashboard.html', total_apt=total_apt, total_doc=total_doc, ai_count=ai_count)
 
@@ -47,41 +114,52 @@ def dashboard_page():
 @app.route('/admin/doctors')
 def view_doctors():
     try:
-        # Hum sirf Name aur Specialization select kar rahe hain
-        db_manager.cursor.execute("SELECT name, specialization FROM doctors")
-        doctors_list = db_manager.cursor.fetchall()
+        # Hum sirf Name aur Specialization le rahe hain (in-memory directory se)
+        doctors_list = doctor_directory.minimal()
         return render_template('view_doctors.html', doctors=doctors_list)
     except Exception as e:
         return f"Database Error: {str(e)}"
 
-# Appointments list dikhane ka function
-# Inside app.py
+def _listing_filters():
+    """Reads the optional appointment listing filters from the query string."""
+    return {
+        "doctor_id": request.args.get('doctor_id', type=int),
+        "date_from": request.args.get('date_from'),
+        "date_to": request.args.get('date_to'),
+        "status": request.args.get('status'),
+    }
+
+# Appointments list dikhane ka function (keyset pagination: ?cursor=...)
 @app.route('/admin/all-appointments')
 def view_all_appointments():
-    query = """
-        SELECT a.id, a.patient_name, d.name, a.appointment_date, a.time_slot, 
-               a.email, a.whatsapp, a.arrival_status, a.arrival_time 
-        FROM appointments a 
-        LEFT JOIN doctors d ON a.doctor_id = d.id
-    """
-    db_manager.cursor.execute(query)
-    rows = db_manager.cursor.fetchall()
-    
-    appointments_list = []
-    for r in rows:
-        appointments_list.append({
-            "id": r[0], "patient": r[1], "doctor": r[2], "date": r[3], 
-            "time": r[4], "email": r[5], "whatsapp": r[6],
-            "arrival_status": r[7], "arrival_time": r[8] # Added these
-        })
-    return render_template('all_appointments_detail.html', appointments=appointments_list)
+    filters = _listing_filters()
+    try:
+        rows, next_cursor = apt_listing.get_page(
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', 50, type=int),
+            **filters
+        )
+    except ValueError as e:
+        return f"Listing Error: {e}"
+
+    appointments_list = [row_to_dict(r) for r in rows]
+    active_filters = {k: v for k, v in filters.items() if v is not None}
+    return render_template('all_appointments_detail.html', appointments=appointments_list,
+                           next_cursor=next_cursor, filters=active_filters)
     
 # Delete karne ka function
 @app.route('/delete-appointment/<int:id>')
 def delete_appointment(id):
     try:
-        db_manager.cursor.execute("DELETE FROM appointments WHERE id = ?", (id,))
-        db_manager.conn.commit()
+        def delete_op(cur):
+            cur.execute("SELECT doctor_id, appointment_date, time_slot, status FROM appointments WHERE id = ?", (id,))
+            row = cur.fetchone()
+            cur.execute("DELETE FROM appointments WHERE id = ?", (id,))
+            return row
+
+        row = write_queue.run(delete_op)
+        if row and row[3] == 'Confirmed':
+            slot_engine.mark_free(row[0], row[1], row[2])
         return redirect(url_for('view_all_appointments'))
     except Exception as e:
         return f"Delete Error: {e}"
@@ -109,39 +187,99 @@ def chat():
         if not user_query:
             return jsonify({"response": "I am ready to assist. Please enter your query."})
 
-        context_docs = retriever.retrieve(user_query, top_k=3)
-        answer = ai_brain.generate_response(user_query, context_docs)
+        ai_query_counter.record('chat')
+        retriever, ai_brain = services.get("retriever"), services.get("ai_brain")
+        answer_cache = services.get("answer_cache")
+
+        def answer_query(query_vector):
+            context_docs = retriever.retrieve(user_query, top_k=3, query_embedding=query_vector)
+            return ai_brain.generate_response(user_query, context_docs)
+
+        # Answers produced without the vector index, or AI error strings, are never cached
+        answer = answer_cache.get_or_compute(
+            user_query, answer_query,
+            cacheable=lambda a: retriever.vectorstore is not None and not a.startswith("❌")
+        )
         return jsonify({"response": answer})
     except Exception as e:
         return jsonify({"response": "Service temporarily unavailable."})
 
+def _sse(payload, event=None):
+    """Formats one Server-Sent Events message."""
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(payload)}\n\n"
+
+@app.route('/chat/stream', methods=['GET', 'POST'])
+def chat_stream():
+    """
+    Server-Sent Events variant of /chat: emits {"token": ...} messages as the
+    answer is generated, then a final 'done' event.
+    """
+    data = request.get_json(silent=True) or {}
+    user_query = (data.get('query') or request.args.get('query', '')).strip()
+
+    def generate():
+        if not user_query:
+            yield _sse({"token": "I am ready to assist. Please enter your query."})
+            yield _sse({}, event="done")
+            return
+        try:
+            ai_query_counter.record('chat')
+            retriever, ai_brain = services.get("retriever"), services.get("ai_brain")
+            answer_cache = services.get("answer_cache")
+
+            query_vector = answer_cache.embed(user_query)
+            cached = answer_cache.lookup(user_query, query_vector)
+            if cached is not None:
+                yield _sse({"token": cached})
+                yield _sse({}, event="done")
+                return
+
+            start = time.perf_counter()
+            context_docs = retriever.retrieve(user_query, top_k=3, query_embedding=query_vector)
+            parts = []
+            for piece in ai_brain.generate_response_stream(user_query, context_docs):
+                parts.append(piece)
+                yield _sse({"token": piece})
+
+            answer = "".join(parts)
+            if retriever.vectorstore is not None and "❌" not in answer:
+                answer_cache.store(user_query, query_vector, answer, time.perf_counter() - start)
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield _sse({"token": "Service temporarily unavailable."})
+        yield _sse({}, event="done")
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/chat/cache-stats', methods=['GET'])
+def chat_cache_stats():
+    """Hit ratios and upstream work saved by the answer cache, embedding cache and request coalescing."""
+    try:
+        embeddings = services.get("embeddings")
+        embedding_stats = embeddings.stats() if hasattr(embeddings, "stats") else None
+        return jsonify({"status": "success", "cache": services.get("answer_cache").stats(),
+                        "embeddings": embedding_stats,
+                        "coalescing": services.get("ai_brain").single_flight.stats()})
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)})
+
 @app.route('/get_specialists', methods=['POST'])
 def get_specialists():
     try:
         data = request.json
         symptoms = data.get('symptoms', '').strip()
-        doctors_list_all = db_manager.get_all_doctors_minimal()
-        
-        ai_suggestion = ai_brain.recommend_doctor(symptoms, doctors_list_all)
-        
-        # 1. Match by Specialization
-        matched_doctors = apt_manager.get_doctors_by_specialty(ai_suggestion)
+        ai_query_counter.record('triage')
+        # Local triage first; the LLM only sees the doctor list when it is unsure
+        ai_suggestion = symptom_triage.recommend(
+            symptoms,
+            lambda s: services.get("ai_brain").recommend_doctor(s, doctor_directory.minimal())
+        )
         
-        # 2. Fallback to Name Search
-        if not matched_doctors:
-            query = "SELECT id, name, specialization, start_time, end_time, room, fee FROM doctors WHERE name LIKE ?"
-            db_manager.cursor.execute(query, (f"%{ai_suggestion.replace('Dr. ', '')}%",))
-            matched_doctors = db_manager.cursor.fetchall()
-
-        # 3. Emergency Fallback
-        if not matched_doctors:
-            db_manager.cursor.execute("SELECT id, name, specialization, start_time, end_time, room, fee FROM doctors LIMIT 3")
-            matched_doctors = db_manager.cursor.fetchall()
-
-        doctor_data = [{
-            "id": doc[0], "name": doc[1], "specialization": doc[2],
-            "time": f"{doc[3]} - {doc[4]}", "room": doc[5], "fee": doc[6]
-        } for doc in matched_doctors]
+        # Specialty match -> name match -> emergency fallback
+        matched_doctors = doctor_directory.match_suggestion(ai_suggestion)
+        doctor_data = [doctor_to_dict(doc) for doc in matched_doctors]
         
         return jsonify({"status": "success", "doctors": doctor_data})
     except Exception as e:
@@ -151,12 +289,8 @@ def get_specialists():
 def get_all_doctors():
     """Route for the second tab 'All Specialists'"""
     try:
-        db_manager.cursor.execute("SELECT id, name, specialization, start_time, end_time, room, fee FROM doctors")
-        all_docs = db_manager.cursor.fetchall()
-        doctor_data = [{
-            "id": doc[0], "name": doc[1], "specialization": doc[2],
-            "time": f"{doc[3]} - {doc[4]}", "room": doc[5], "fee": doc[6]
-        } for doc in all_docs]
+        all_docs = doctor_directory.all()
+        doctor_data = [doctor_to_dict(doc) for doc in all_docs]
         return jsonify({"status": "success", "doctors": doctor_data})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)})
@@ -167,22 +301,9 @@ def get_slots():
     doc_id = data.get('doc_id')
     apt_date = data.get('date') # Frontend se aane wali date
     
-    # Doctor ki full timing DB se lein
-    db_manager.cursor.execute("SELECT start_time, end_time FROM doctors WHERE id=?", (doc_id,))
-    res = db_manager.cursor.fetchone()
-    
-    if res:
-        all_slots = apt_manager.generate_time_slots(res[0], res[1])
-        
-        # Check karein ke is date par kitne slots booked hain
-        db_manager.cursor.execute(
-            "SELECT time_slot FROM appointments WHERE doctor_id=? AND appointment_date=? AND status='Confirmed'",
-            (doc_id, apt_date)
-        )
-        booked_slots = [row[0] for row in db_manager.cursor.fetchall()]
-        
-        # Available aur booked ki list banayein
-        slot_data = [{"time": s, "is_booked": s in booked_slots} for s in all_slots]
+    # Slot grid aur booked bitmap memory se aate hain (SQLite sirf pehli dafa)
+    slot_data = slot_engine.get_availability(doc_id, apt_date)
+    if slot_data is not None:
         return jsonify({"status": "success", "slots": slot_data})
         
     return jsonify({"status": "error", "message": "Doctor timings not found."})
@@ -200,15 +321,21 @@ def confirm_booking():
             INSERT INTO appointments (patient_name, doctor_id, appointment_date, time_slot, email, whatsapp, status)
             VALUES (?, ?, ?, ?, ?, ?, 'Confirmed')
         """
-        db_manager.cursor.execute(query, (
+        params = (
             data.get('patient'),
             data.get('doc_id'),
             data.get('date'),
             data.get('time'),
             p_email,     # Naya column
             p_whatsapp   # Naya column
-        ))
-        db_manager.conn.commit()
+        )
+        # Batched with other writes; the unique slot index rejects double-booking atomically
+        try:
+            write_queue.run(lambda cur: cur.execute(query, params))
+        except sqlite3.IntegrityError:
+            logger.warning(f"Double-booking rejected: doctor {data.get('doc_id')} {data.get('date')} {data.get('time')}")
+            return jsonify({"status": "error", "message": "This slot has just been booked. Please choose another time."})
+        slot_engine.mark_booked(data.get('doc_id'), data.get('date'), data.get('time'))
         
         logger.info(f"✅ Booked: {data.get('patient')} | Email: {p_email} | WA: {p_whatsapp}")
         return jsonify({"status": "success", "message": "Appointment confirmed!"})
@@ -218,20 +345,12 @@ def confirm_booking():
 
 @app.route('/get_all_appointments', methods=['GET'])
 def get_all_appointments():
-    """API for Admin Dashboard table including Email and WhatsApp"""
-    try:
-        # Humne SELECT query mein email aur whatsapp ko shamil kar liya hai
-        query = """
-            SELECT a.id, a.patient_name, d.name, a.appointment_date, a.time_slot, a.status, a.email, a.whatsapp 
-            FROM appointments a
-            JOIN doctors d ON a.doctor_id = d.id
-            ORDER BY a.appointment_date DESC
-        """
-        db_manager.cursor.execute(query)
-        rows = db_manager.cursor.fetchall()
-        
-        # Dictionary mein mapping update kar di
-        appts = [{
+    """
+    API for Admin Dashboard table including Email and WhatsApp.
+    Paginated with ?cursor=&limit=; ?format=ndjson streams every matching row instead.
+    """
+    def to_api(r):
+        return {
             # "id": r[0], 
             "patient": r[1], 
             "doctor": r[2],
@@ -240,9 +359,25 @@ def get_all_appointments():
             "status": r[5],
             "email": r[6] if r[6] else "N/A",      # Email handle
             "whatsapp": r[7] if r[7] else "N/A"    # WhatsApp handle
-        } for r in rows]
-        
-        return jsonify({"status": "success", "appointments": appts})
+        }
+
+    try:
+        filters = _listing_filters()
+
+        if request.args.get('format') == 'ndjson':
+            def generate():
+                for r in apt_listing.iter_rows(require_doctor=True, **filters):
+                    yield json.dumps(to_api(r)) + "\n"
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+        rows, next_cursor = apt_listing.get_page(
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', 50, type=int),
+            require_doctor=True,
+            **filters
+        )
+        appts = [to_api(r) for r in rows]
+        return jsonify({"status": "success", "appointments": appts, "next_cursor": next_cursor})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)})
     
@@ -262,8 +397,7 @@ def check_in_patient(appointment_id):
             SET arrival_status = 'Arrived', arrival_time = ? 
             WHERE id = ?
         """
-        db_manager.cursor.execute(query, (current_time, appointment_id))
-        db_manager.conn.commit()
+        write_queue.run(lambda cur: cur.execute(query, (current_time, appointment_id)))
         
         # Logic for Automation: You can trigger an n8n webhook here 
         # to notify the doctor's screen immediately.
@@ -291,17 +425,16 @@ def process_checkin():
         apt_id = request.form.get('appointment_id')
         current_time = datetime.now().strftime("%I:%M %p")
         
-        # Verify if ID exists
-        db_manager.cursor.execute("SELECT id FROM appointments WHERE id = ?", (apt_id,))
-        if not db_manager.cursor.fetchone():
-            return "<h3>Error: Appointment ID not found. Please ask the receptionist.</h3>"
+        # Update status; zero rows updated means the ID does not exist
+        def checkin_op(cur):
+            cur.execute("""
+                UPDATE appointments SET arrival_status = 'Arrived', arrival_time = ? 
+                WHERE id = ?
+            """, (current_time, apt_id))
+            return cur.rowcount
 
-        # Update status
-        db_manager.cursor.execute("""
-            UPDATE appointments SET arrival_status = 'Arrived', arrival_time = ? 
-            WHERE id = ?
-        """, (current_time, apt_id))
-        db_manager.conn.commit()
+        if not write_queue.run(checkin_op):
+            return "<h3>Error: Appointment ID not found. Please ask the receptionist.</h3>"
         
         return f"<h3>Welcome! Your attendance is marked at {current_time}. Please wait.</h3>"
     except Exception as e:
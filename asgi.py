@@ -0,0 +1,112 @@
+"""
+ASGI entry point for the HMS.
+
+/chat and /get_specialists are served natively on the asyncio pipeline
+(src/async_pipeline.py); every other route is passed through to the Flask
+app unchanged. Run with:
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+AI_MAX_CONCURRENCY caps in-flight AI requests per process (default 200).
+"""
+import json
+import os
+import time
+import uuid
+from asgiref.wsgi import WsgiToAsgi
+
+import app as hms
+from src.async_pipeline import AsyncAIPipeline
+from src.counters import ai_query_counter
+from src.metrics import metrics
+from src.services import services
+from src.triage import symptom_triage
+from src.logger import logger, set_request_id
+
+flask_asgi = WsgiToAsgi(hms.app)
+pipeline = AsyncAIPipeline(
+    services, symptom_triage,
+    max_concurrency=int(os.getenv("AI_MAX_CONCURRENCY", "200"))
+)
+
+async def _read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    return json.loads(body or b"{}")
+
+async def _send_json(send, payload, status=200):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def chat(receive, send):
+    try:
+        data = await _read_json(receive)
+        user_query = data.get('query', '').strip()
+        if not user_query:
+            return await _send_json(send, {"response": "I am ready to assist. Please enter your query."})
+
+        ai_query_counter.record('chat')
+        answer = await pipeline.chat(user_query)
+        await _send_json(send, {"response": answer})
+    except Exception as e:
+        logger.error(f"Async chat error: {e}")
+        await _send_json(send, {"response": "Service temporarily unavailable."})
+
+async def get_specialists(receive, send):
+    try:
+        data = await _read_json(receive)
+        symptoms = data.get('symptoms', '').strip()
+        ai_query_counter.record('triage')
+        doctor_data = await pipeline.specialists(symptoms)
+        await _send_json(send, {"status": "success", "doctors": doctor_data})
+    except Exception as e:
+        await _send_json(send, {"status": "error", "message": str(e)})
+
+ASYNC_ROUTES = {
+    "/chat": chat,
+    "/get_specialists": get_specialists,
+}
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    handler = ASYNC_ROUTES.get(scope.get("path"))
+    if scope["type"] == "http" and scope["method"] == "POST" and handler is not None:
+        start = time.perf_counter()
+        headers = dict(scope.get("headers") or [])
+        # Each ASGI request runs in its own task, so the context variable is per request
+        request_id = headers.get(b"x-request-id", b"").decode() or uuid.uuid4().hex[:12]
+        set_request_id(request_id)
+        response = {"status": 500}
+
+        # Same response metrics and X-Request-ID header as the Flask routes (app.py)
+        async def send_tagged(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"x-request-id", request_id.encode())]}
+            await send(message)
+
+        try:
+            return await handler(receive, send_tagged)
+        finally:
+            metrics.observe("http_request_seconds", time.perf_counter() - start, endpoint=scope["path"])
+            metrics.inc("http_responses_total", endpoint=scope["path"], status=str(response["status"]))
+
+    await flask_asgi(scope, receive, send)
@@ -0,0 +1,126 @@
+"""
+Compares the embedding runtimes (PyTorch vs ONNX int8) on this machine.
+
+Each runtime is measured in its own subprocess so load time and peak RSS are
+not polluted by the other. The ONNX vectors are then checked against the
+PyTorch ones; the script exits 1 if any cosine similarity falls below
+--min-cosine (default 0.99).
+
+    python benchmarks/embedding_runtimes.py --threads 4
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Project root ko path mein add karein taake 'src' import ho sake
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+
+SAMPLE_TEXTS = [
+    "Persistent chest pain radiating to the left arm with sweating",
+    "Recommended first-line treatment for uncomplicated hypertension in adults",
+    "Paracetamol dosage for a 20 kg child with fever",
+    "Itchy red rash on both forearms after starting a new soap",
+    "Signs of diabetic ketoacidosis and initial fluid management",
+    "Severe migraine with aura and sensitivity to light",
+    "Contraindications of metformin in chronic kidney disease",
+    "Pregnant woman at 32 weeks with swelling in feet and headache",
+    "Child with barking cough and noisy breathing at night",
+    "Management of acute asthma exacerbation in the emergency department",
+    "Thyroid function tests show low TSH and high free T4",
+    "Antibiotic choice for community acquired pneumonia without comorbidities",
+    "Sudden weakness on one side of the body and slurred speech",
+    "Depression screening questions for primary care",
+    "Right lower abdominal pain with vomiting and low grade fever",
+    "Warfarin interaction with common antibiotics",
+]
+
+def measure(runtime, vectors_path, queries):
+    """Runs inside the worker subprocess: load, embed, report."""
+    from src.embeddings import MedicalEmbeddingManager
+
+    start = time.perf_counter()
+    model = MedicalEmbeddingManager(use_cache=False, runtime=runtime).get_embeddings()
+    model.embed_query("warm up")
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(queries):
+        model.embed_query(SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)])
+    qps = queries / (time.perf_counter() - start)
+
+    batch = SAMPLE_TEXTS * 8
+    start = time.perf_counter()
+    vectors = model.embed_documents(batch)
+    docs_per_second = len(batch) / (time.perf_counter() - start)
+
+    np.save(vectors_path, np.asarray(vectors[:len(SAMPLE_TEXTS)], dtype=np.float32))
+    return {
+        "runtime": runtime,
+        "load_seconds": round(load_seconds, 2),
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "queries_per_second": round(qps, 1),
+        "docs_per_second": round(docs_per_second, 1),
+    }
+
+def run_worker(runtime, vectors_path, args):
+    env = dict(os.environ)
+    if args.threads:
+        env["ONNX_THREADS"] = str(args.threads)
+        env["OMP_NUM_THREADS"] = str(args.threads)  # same budget for PyTorch
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", runtime, "--vectors", vectors_path,
+         "--queries", str(args.queries)],
+        env=env, cwd=ROOT, capture_output=True, text=True
+    )
+    if out.returncode != 0:
+        sys.exit(f"❌ {runtime} worker failed:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads for both runtimes (0 = default)")
+    parser.add_argument("--queries", type=int, default=200, help="single-query calls for the QPS figure")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="parity threshold vs PyTorch")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--vectors", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.vectors, args.queries)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for runtime in ("torch", "onnx"):
+            path = os.path.join(tmp, f"{runtime}.npy")
+            results[runtime] = run_worker(runtime, path, args)
+            results[runtime]["vectors"] = np.load(path)
+
+    ref, cand = results["torch"].pop("vectors"), results["onnx"].pop("vectors")
+    cosines = (ref * cand).sum(axis=1) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(cand, axis=1))
+
+    print("=" * 70)
+    print("EMBEDDING RUNTIME BENCHMARK")
+    print("=" * 70)
+    print(f"{'runtime':<10}{'load (s)':>10}{'peak RSS (MB)':>16}{'queries/s':>12}{'docs/s':>10}")
+    for r in results.values():
+        print(f"{r['runtime']:<10}{r['load_seconds']:>10}{r['peak_rss_mb']:>16}"
+              f"{r['queries_per_second']:>12}{r['docs_per_second']:>10}")
+    print(f"\nParity vs torch: min cosine {cosines.min():.4f}, mean {cosines.mean():.4f} "
+          f"(threshold {args.min_cosine})")
+    ok = bool(cosines.min() >= args.min_cosine)
+    print("PASS" if ok else "FAIL: quantized vectors drift too far from PyTorch")
+    print("=" * 70)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+Offline load test for the Flask app, with local stand-ins for Groq, the
+embedding model and Pinecone (see stand_ins.py).
+
+The app runs in-process against a temporary copy of hospital_management.db
+(seeded with --appointments extra bookings so the admin listings paginate
+real data). Worker threads drive a weighted mix of /get_slots,
+/confirm_booking, /chat, /get_specialists and the admin listings in a closed
+loop, at each concurrency level in --levels, and the script reports RPS and
+p50/p99 latency per endpoint.
+
+With --save-baseline the results are written to --baseline; otherwise they
+are compared with it and the script exits 1 when, at any level, an
+endpoint's p99 grows or its RPS drops by more than --tolerance. Baselines are
+machine-specific: record one on the machine that runs the comparison.
+
+    python benchmarks/load_test.py --levels 1,8,32 --duration 10 --save-baseline
+    python benchmarks/load_test.py --levels 1,8,32 --duration 10
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+# Project root ko path mein add karein taake 'src' aur 'app' import ho sakein
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+DEFAULT_MIX = ("get_slots=30,confirm_booking=10,chat=20,get_specialists=15,"
+               "get_all_appointments=10,admin_appointments=5,admin_doctors=5,get_all_doctors=5")
+
+QUESTIONS = [
+    "What is the first-line treatment for hypertension?",
+    "How is type 2 diabetes diagnosed?",
+    "What relieves an acute asthma attack?",
+    "Which drugs prevent migraine?",
+    "How do you treat eczema?",
+    "Do small kidney stones pass on their own?",
+    "What is stable angina?",
+    "How long does oral iron take to work?",
+    "What blood pressure counts as hypertension",
+    "what is the first line treatment for hypertension",
+    "Symptoms of iron deficiency anaemia?",
+    "Is metformin used for diabetes?",
+]
+
+SYMPTOMS = [
+    "chest pain when climbing stairs",
+    "itchy red rash on my arms",
+    "severe headache with nausea",
+    "pain in my lower back near the kidney",
+    "child has a fever and cough",
+    "feeling tired all the time",
+    "blurred vision and dizziness",
+    "my knee hurts after running",
+    "skin allergy and acne",
+    "stomach ache after eating",
+]
+
+PATIENTS = ["Ali", "Sara", "Usman", "Ayesha", "Bilal", "Hina", "Omar", "Zainab"]
+
+def parse_mix(spec):
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+# --- Environment ---
+
+def prepare_workdir(workdir):
+    """Temp copy of the DB; the app resolves the DB, logs and data/ relative to the working directory."""
+    shutil.copy(os.path.join(ROOT, "hospital_management.db"), os.path.join(workdir, "hospital_management.db"))
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    os.chdir(workdir)
+    os.environ.update(SERVICES_WARMUP="0", LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+                      LOG_FILE=os.path.join(workdir, "load_test.log"))
+    # Stand-in calls have no provider quota; the gateway's concurrency cap and retries still apply
+    os.environ.setdefault("LLM_RATE_PER_MINUTE", "0")
+
+def seed_appointments(count, rng):
+    """Adds `count` past confirmed bookings on distinct slots, in one transaction."""
+    from src.database_manager import db_manager
+    from src.slot_engine import build_slot_grid
+
+    doctors = db_manager.fetch_all("SELECT id, start_time, end_time FROM doctors WHERE active = 1")
+    grids = [(doc_id, build_slot_grid(start, end)) for doc_id, start, end in doctors]
+    grids = [(doc_id, grid) for doc_id, grid in grids if grid]
+    rows, day = [], date.today() - timedelta(days=1)
+    while len(rows) < count and grids:
+        for doc_id, grid in grids:
+            for slot in grid:
+                rows.append((rng.choice(PATIENTS), doc_id, day.isoformat(), slot,
+                             "patient@example.com", "923000000000"))
+        day -= timedelta(days=1)
+    rows = rows[:count]
+    with db_manager.write() as cur:
+        cur.executemany(
+            "INSERT INTO appointments (patient_name, doctor_id, appointment_date, time_slot, email, whatsapp, status) "
+            "VALUES (?, ?, ?, ?, ?, ?, 'Confirmed')", rows)
+    return len(rows)
+
+# --- Workload ---
+
+class Workload:
+    """Each endpoint method sends one request and returns True when the app answered successfully."""
+    def __init__(self):
+        from src.database_manager import db_manager
+        from src.slot_engine import build_slot_grid
+
+        doctors = db_manager.fetch_all("SELECT id, start_time, end_time FROM doctors WHERE active = 1")
+        self.grids = [(doc_id, build_slot_grid(start, end)) for doc_id, start, end in doctors]
+        self.grids = [(doc_id, grid) for doc_id, grid in self.grids if grid]
+        self.doctor_ids = [doc_id for doc_id, _ in self.grids]
+        self.dates = [(date.today() + timedelta(days=n)).isoformat() for n in range(1, 31)]
+        self._booking = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ok(response):
+        if response.status_code >= 400:
+            return False
+        body = response.get_json(silent=True)
+        return body is None or body.get("status", "success") == "success"
+
+    def get_slots(self, client, rng):
+        return self._ok(client.post("/get_slots", json={"doc_id": rng.choice(self.doctor_ids),
+                                                        "date": rng.choice(self.dates)}))
+
+    def confirm_booking(self, client, rng):
+        doc_id, grid = rng.choice(self.grids)
+        with self._lock:
+            self._booking += 1
+            n = self._booking
+        response = client.post("/confirm_booking", json={
+            "patient": f"{rng.choice(PATIENTS)} {n}", "doc_id": doc_id, "date": rng.choice(self.dates),
+            "time": rng.choice(grid), "email": "patient@example.com", "whatsapp": "923000000000",
+        })
+        if response.status_code >= 400:
+            return False
+        body = response.get_json(silent=True) or {}
+        # A slot already taken is a correct answer under contention, not a failure
+        return body.get("status") == "success" or "just been booked" in body.get("message", "")
+
+    def chat(self, client, rng):
+        response = client.post("/chat", json={"query": rng.choice(QUESTIONS)})
+        return response.status_code == 200 and "temporarily unavailable" not in response.get_data(as_text=True)
+
+    def get_specialists(self, client, rng):
+        return self._ok(client.post("/get_specialists", json={"symptoms": rng.choice(SYMPTOMS)}))
+
+    def get_all_appointments(self, client, rng):
+        return self._ok(client.get("/get_all_appointments?limit=50"))
+
+    def admin_appointments(self, client, rng):
+        return self._ok(client.get(f"/admin/all-appointments?doctor_id={rng.choice(self.doctor_ids)}"))
+
+    def admin_doctors(self, client, rng):
+        return self._ok(client.get("/admin/doctors"))
+
+    def get_all_doctors(self, client, rng):
+        return self._ok(client.get("/get_all_doctors"))
+
+def run_level(app, workload, mix, workers, duration, seed):
+    """Closed loop: each worker sends its next request as soon as the previous one returns."""
+    names, weights = list(mix), list(mix.values())
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = app.test_client()
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while time.perf_counter() < stop_at:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = getattr(workload, name)(client, rng)
+            except Exception:
+                ok = False
+            local[name].append(time.perf_counter() - start)
+            local_errors[name] += not ok
+        with lock:
+            for name in names:
+                samples[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), name=f"load-{i}") for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    result = {}
+    for name in names:
+        values = sorted(samples[name])
+        if values:
+            result[name] = {"requests": len(values), "errors": errors[name],
+                            "rps": len(values) / elapsed,
+                            "p50": percentile(values, 0.50), "p99": percentile(values, 0.99)}
+    total = sum(r["requests"] for r in result.values())
+    result["total"] = {"requests": total, "errors": sum(r["errors"] for r in result.values()),
+                       "rps": total / elapsed}
+    return result
+
+# --- Baseline ---
+
+def compare(results, baseline, tolerance):
+    """Returns regression messages: p99 up or RPS down by more than `tolerance` (a fraction)."""
+    problems = []
+    for level, endpoints in results.items():
+        for name, current in endpoints.items():
+            base = baseline.get(level, {}).get(name)
+            if not base:
+                continue
+            if "p99" in base and current["p99"] > base["p99"] * (1 + tolerance) \
+                    and current["p99"] - base["p99"] > 0.002:
+                problems.append(f"{name} @ {level} workers: p99 {base['p99'] * 1000:.1f}ms -> "
+                                f"{current['p99'] * 1000:.1f}ms")
+            if current["rps"] < base["rps"] * (1 - tolerance):
+                problems.append(f"{name} @ {level} workers: RPS {base['rps']:.1f} -> {current['rps']:.1f}")
+    return problems
+
+def print_level(level, result):
+    print(f"\n--- {level} concurrent workers: {result['total']['rps']:.1f} req/s, "
+          f"{result['total']['errors']} errors ---")
+    print(f"{'endpoint':<24}{'requests':>10}{'RPS':>9}{'p50 (ms)':>11}{'p99 (ms)':>11}{'errors':>8}")
+    for name, r in result.items():
+        if name != "total":
+            print(f"{name:<24}{r['requests']:>10}{r['rps']:>9.1f}{r['p50'] * 1000:>11.1f}"
+                  f"{r['p99'] * 1000:>11.1f}{r['errors']:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,4,16,32", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight pairs")
+    parser.add_argument("--llm-latency", type=float, default=0.25, help="stand-in Groq call (s)")
+    parser.add_argument("--embed-latency", type=float, default=0.005, help="stand-in query embedding (s)")
+    parser.add_argument("--vector-latency", type=float, default=0.03, help="stand-in Pinecone query (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="± fraction applied to each injected latency")
+    parser.add_argument("--appointments", type=int, default=2000, help="bookings seeded before the run")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", default=os.path.join(ROOT, "benchmarks", "load_baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p99 growth / RPS drop")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    unknown = [name for name in mix if not hasattr(Workload, name)]
+    if unknown:
+        sys.exit(f"❌ Unknown endpoints in --mix: {', '.join(unknown)}")
+    levels = [int(n) for n in args.levels.split(",")]
+    config = {"mix": mix, "llm_latency": args.llm_latency, "embed_latency": args.embed_latency,
+              "vector_latency": args.vector_latency, "jitter": args.jitter, "appointments": args.appointments,
+              "duration": args.duration, "seed": args.seed}
+
+    workdir = tempfile.mkdtemp(prefix="hms-load-")
+    cwd = os.getcwd()
+    prepare_workdir(workdir)
+    try:
+        import app as hms
+        from src.metrics import metrics
+        from src.services import services
+        from stand_ins import install
+
+        fakes = install(services, llm_latency=args.llm_latency, embed_latency=args.embed_latency,
+                        vector_latency=args.vector_latency, jitter=args.jitter, seed=args.seed)
+        seeded = seed_appointments(args.appointments, random.Random(args.seed))
+        services.warm_up(background=False)
+        workload = Workload()
+
+        print("=" * 72)
+        print("LOAD TEST (stand-in Groq / embeddings / Pinecone)")
+        print("=" * 72)
+        print(f"LLM {args.llm_latency * 1000:.0f}ms, embedding {args.embed_latency * 1000:.0f}ms, "
+              f"vector search {args.vector_latency * 1000:.0f}ms (±{args.jitter:.0%}); "
+              f"{seeded} seeded bookings; {args.duration:.0f}s per level")
+
+        results = {}
+        for level in levels:
+            results[str(level)] = run_level(hms.app, workload, mix, level, args.duration, args.seed)
+            print_level(level, results[str(level)])
+
+        print("\nServer-side stages (all levels):")
+        for labels, s in sorted(metrics.snapshot("stage_seconds").items()):
+            print(f"  {dict(labels).get('stage', '?'):<20} n={s['count']:<7} "
+                  f"p50={s['p50'] * 1000:.1f}ms p99={s['p99'] * 1000:.1f}ms")
+        print(f"  stand-in LLM calls: {fakes['llm'].calls}, "
+              f"coalescing: {services.get('ai_brain').single_flight.stats()['coalescing_rate']:.2f}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+        print(f"\n💾 Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nℹ️ No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print("\n⚠️ Baseline was recorded with different settings; not comparing.")
+        return 0
+    problems = compare(results, baseline["results"], args.tolerance)
+    print("\n" + ("\n".join(f"❌ REGRESSION: {p}" for p in problems) if problems
+                  else f"✅ Within {args.tolerance:.0%} of the baseline."))
+    print("=" * 72)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
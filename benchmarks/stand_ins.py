@@ -0,0 +1,193 @@
+"""
+Deterministic local stand-ins for Groq, the embedding model and Pinecone,
+with configurable injected latency, for offline load tests.
+
+The same prompt / text always produces the same answer, vector and search
+hits, so runs are comparable. Latency is `latency * (1 ± jitter)` drawn from
+a seeded generator.
+
+    from stand_ins import install      # benchmarks/ is on sys.path for the scripts here
+    install(services, llm_latency=0.25, vector_latency=0.03)
+"""
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+TOPICS = [
+    ("Hypertension", "Blood pressure above 140/90 mmHg on repeated readings is treated with lifestyle change, "
+                     "ACE inhibitors, calcium channel blockers or thiazide diuretics."),
+    ("Diabetes", "Type 2 diabetes is diagnosed by HbA1c of 6.5% or higher; metformin is the usual first-line "
+                 "therapy alongside diet and exercise."),
+    ("Asthma", "Asthma causes wheeze, cough and breathlessness; inhaled corticosteroids control inflammation "
+               "and short-acting beta agonists relieve acute symptoms."),
+    ("Migraine", "Migraine presents as a throbbing unilateral headache with nausea and photophobia; triptans "
+                 "abort attacks and beta blockers help prevention."),
+    ("Eczema", "Atopic dermatitis causes itchy, dry skin patches; emollients and topical steroids are the "
+               "mainstay of treatment."),
+    ("Kidney stones", "Renal colic causes severe flank pain radiating to the groin; small stones usually pass "
+                      "with fluids and analgesia."),
+    ("Angina", "Stable angina is chest pain on exertion relieved by rest or nitroglycerin; it signals "
+               "coronary artery disease."),
+    ("Anaemia", "Iron deficiency anaemia causes fatigue and pallor; oral iron replaces stores over three months."),
+]
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+class _Latency:
+    """Seeded `latency * (1 ± jitter)` sleeps, shared by the stand-ins."""
+    def __init__(self, latency: float, jitter: float, seed: int):
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> float:
+        if self.latency <= 0:
+            return 0.0
+        with self._lock:
+            spread = self._rng.uniform(-self.jitter, self.jitter)
+        return self.latency * (1 + spread)
+
+    def sleep(self):
+        delay = self.draw()
+        if delay:
+            time.sleep(delay)
+
+    async def asleep(self):
+        delay = self.draw()
+        if delay:
+            await asyncio.sleep(delay)
+
+class FakeChatModel:
+    """Groq stand-in: answers RAG prompts from their CONTEXT and triage prompts with a listed doctor."""
+    def __init__(self, latency=0.25, jitter=0.2, stream_chunks=8, seed=0):
+        self.delay = _Latency(latency, jitter, seed)
+        self.stream_chunks = stream_chunks
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _text(messages):
+        return "\n".join(getattr(m, "content", str(m)) for m in messages)
+
+    def _answer(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+        if "Doctors List:" in prompt:
+            doctors = re.findall(r"\('([^']+)', '[^']*'\)", prompt)
+            return doctors[_digest(prompt) % len(doctors)] if doctors else "General Physician"
+        context = prompt.split("CONTEXT:", 1)[-1].split("QUESTION:", 1)[0].strip()
+        if not context:
+            return "This information is not available in the provided medical records. Please consult a specialist."
+        first = context.splitlines()[1] if "\n" in context else context
+        return f"**Answer**\n- {first[:240]}\n- Reference #{_digest(prompt) % 10000:04d}"
+
+    def invoke(self, messages, **kwargs):
+        self.delay.sleep()
+        return AIMessage(content=self._answer(self._text(messages)))
+
+    async def ainvoke(self, messages, **kwargs):
+        await self.delay.asleep()
+        return AIMessage(content=self._answer(self._text(messages)))
+
+    def stream(self, messages, **kwargs):
+        # The total latency is spread over the chunks, like a token stream
+        total = self.delay.draw()
+        words = self._answer(self._text(messages)).split(" ")
+        size = max(1, len(words) // self.stream_chunks)
+        for i in range(0, len(words), size):
+            time.sleep(total / self.stream_chunks)
+            yield AIMessageChunk(content=" ".join(words[i:i + size]) + " ")
+
+class FakeEmbeddings:
+    """Embedding model stand-in: a unit vector seeded by the text's hash."""
+    def __init__(self, dim=384, latency=0.005, jitter=0.2, seed=0):
+        self.dim = dim
+        self.delay = _Latency(latency, jitter, seed)
+
+    def _vector(self, text: str):
+        vec = np.random.default_rng(_digest(" ".join(text.casefold().split()))).standard_normal(self.dim)
+        return (vec / np.linalg.norm(vec)).astype(np.float32).tolist()
+
+    def embed_query(self, text: str):
+        self.delay.sleep()
+        return self._vector(text)
+
+    def embed_documents(self, texts):
+        self.delay.sleep()
+        return [self._vector(t) for t in texts]
+
+class FakeVectorStore:
+    """Pinecone stand-in over a synthetic corpus; hits and scores are a function of the query."""
+    def __init__(self, corpus, latency=0.03, jitter=0.2, seed=0):
+        self.corpus = corpus
+        self.delay = _Latency(latency, jitter, seed)
+
+    def _hits(self, key: int, k: int):
+        rng = random.Random(key)
+        picks = rng.sample(range(len(self.corpus)), min(k, len(self.corpus)))
+        scores = sorted((rng.uniform(0.2, 0.9) for _ in picks), reverse=True)
+        return [(self.corpus[i], score) for i, score in zip(picks, scores)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        self.delay.sleep()
+        return self._hits(_digest(query), k)
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, **kwargs):
+        self.delay.sleep()
+        return self._hits(_digest(repr(embedding[:8])), k)
+
+    async def asimilarity_search_with_score(self, query, k=4, **kwargs):
+        await self.delay.asleep()
+        return self._hits(_digest(query), k)
+
+def build_corpus(size=200, chunk_chars=1000):
+    """Synthetic guideline chunks with the metadata the ingestion pipeline writes."""
+    corpus = []
+    for n in range(size):
+        title, text = TOPICS[n % len(TOPICS)]
+        page = n // len(TOPICS)
+        body = (f"{title}. {text} " * (chunk_chars // len(text) + 1))[:chunk_chars]
+        corpus.append(Document(
+            page_content=body, id=f"synthetic-{n}",
+            metadata={"source": f"data/{title.lower().replace(' ', '_')}.pdf", "page": page,
+                      "start_index": 0, "total_pages": size // len(TOPICS) + 1},
+        ))
+    return corpus
+
+def install(services, llm_latency=0.25, embed_latency=0.005, vector_latency=0.03,
+            jitter=0.2, corpus_size=200, seed=0, bm25_path=None):
+    """Registers the stand-ins under the real service names; returns them for inspection."""
+    from src.ai_engine import MedicalAIEngine
+    from src.lexical_index import BM25Index
+    from src.triage import symptom_triage
+
+    corpus = build_corpus(corpus_size)
+    fakes = {
+        "llm": FakeChatModel(llm_latency, jitter, seed=seed),
+        "embeddings": FakeEmbeddings(latency=embed_latency, jitter=jitter, seed=seed + 1),
+        "vectorstore": FakeVectorStore(corpus, vector_latency, jitter, seed=seed + 2),
+    }
+
+    def build_embeddings():
+        symptom_triage.attach_embeddings(fakes["embeddings"])
+        return fakes["embeddings"]
+
+    def build_lexical_index():
+        index = BM25Index(path=bm25_path or os.path.join("data", ".bm25_corpus.json"))
+        index.add([d.id for d in corpus], [d.page_content for d in corpus], [d.metadata for d in corpus])
+        return index
+
+    services.register("embeddings", build_embeddings)
+    services.register("vectorstore", lambda: fakes["vectorstore"])
+    services.register("lexical_index", build_lexical_index)
+    services.register("ai_brain", lambda: MedicalAIEngine(llm=fakes["llm"]))
+    return fakes
@@ -0,0 +1,86 @@
+"""
+Measures how quickly a fresh process can serve pages.
+
+Runs in a clean subprocess per sample and reports:
+  * import app            - time to import the Flask app
+  * first dashboard page  - import + first GET / (DB opened on demand)
+  * ready (/healthz 200)  - with background warm-up, until every AI service is up
+
+Exits 1 when the median time to the first dashboard page exceeds
+--max-seconds (default 1.0).
+
+    python benchmarks/startup_time.py --samples 5 --with-warmup
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, os, sys, time
+start = time.perf_counter()
+import app as hms
+imported = time.perf_counter() - start
+client = hms.app.test_client()
+status = client.get("/").status_code
+first_page = time.perf_counter() - start
+ready = None
+if os.getenv("SERVICES_WARMUP") != "0":
+    deadline = time.perf_counter() + float(sys.argv[1])
+    while time.perf_counter() < deadline:
+        if client.get("/healthz").status_code == 200:
+            ready = time.perf_counter() - start
+            break
+        time.sleep(0.05)
+print(json.dumps({"import": imported, "first_page": first_page, "ready": ready, "status": status}))
+"""
+
+def sample(warmup, ready_timeout):
+    env = dict(os.environ, SERVICES_WARMUP="1" if warmup else "0")
+    out = subprocess.run([sys.executable, "-c", PROBE, str(ready_timeout)], cwd=ROOT, env=env,
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        sys.exit(f"❌ Probe failed:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.0, help="budget for the first dashboard page")
+    parser.add_argument("--with-warmup", action="store_true", help="also time readiness with background warm-up")
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    cold = [sample(False, 0) for _ in range(args.samples)]
+    rows = [
+        ("import app", [r["import"] for r in cold]),
+        ("first dashboard page", [r["first_page"] for r in cold]),
+    ]
+    if args.with_warmup:
+        warm = [sample(True, args.ready_timeout) for _ in range(args.samples)]
+        rows.append(("first page (warm-up on)", [r["first_page"] for r in warm]))
+        ready = [r["ready"] for r in warm if r["ready"] is not None]
+        if ready:
+            rows.append(("ready (/healthz 200)", ready))
+        else:
+            print(f"⚠️ Services never became ready within {args.ready_timeout}s (see /healthz for errors).")
+
+    print("=" * 70)
+    print("STARTUP BENCHMARK")
+    print("=" * 70)
+    print(f"{'stage':<28}{'median (s)':>12}{'min (s)':>10}{'max (s)':>10}")
+    for label, values in rows:
+        print(f"{label:<28}{statistics.median(values):>12.3f}{min(values):>10.3f}{max(values):>10.3f}")
+
+    first_page = statistics.median(r["first_page"] for r in cold)
+    ok = first_page <= args.max_seconds
+    print(f"\n{'PASS' if ok else 'FAIL'}: first page in {first_page:.3f}s (budget {args.max_seconds}s)")
+    print("=" * 70)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
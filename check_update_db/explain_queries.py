@@ -0,0 +1,98 @@
+import os
+import sys
+
+# Project root ko path mein add karein taake 'src' import ho sake
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database_manager import HospitalDB
+
+# Every query issued by app.py and the modules it serves from, with representative params.
+# Keep this list in sync when a route's SQL changes.
+APP_QUERIES = [
+    ("doctor directory: version check", "SELECT value FROM stats_counters WHERE name = 'doctors_version'", ()),
+    ("doctor directory: load", "SELECT id, name, specialization, start_time, end_time, room, fee FROM doctors WHERE active = 1 ORDER BY id", ()),
+    ("dashboard: counters", "SELECT name, value FROM stats_counters", ()),
+    ("dashboard: AI queries today", "SELECT COALESCE(SUM(count), 0) FROM ai_query_stats WHERE day = ?", ("2026-01-01",)),
+    ("view_all_appointments: first page", """
+        SELECT a.id, a.patient_name, d.name, a.appointment_date, a.time_slot, a.status,
+               a.email, a.whatsapp, a.arrival_status, a.arrival_time
+        FROM appointments a
+        LEFT JOIN doctors d ON a.doctor_id = d.id
+        ORDER BY a.appointment_date DESC, a.id DESC LIMIT ?
+    """, (51,)),
+    ("view_all_appointments: next page", """
+        SELECT a.id, a.patient_name, d.name, a.appointment_date, a.time_slot, a.status,
+               a.email, a.whatsapp, a.arrival_status, a.arrival_time
+        FROM appointments a
+        LEFT JOIN doctors d ON a.doctor_id = d.id
+        WHERE (a.appointment_date, a.id) < (?, ?)
+        ORDER BY a.appointment_date DESC, a.id DESC LIMIT ?
+    """, ("2026-01-01", 10, 51)),
+    ("view_all_appointments: doctor filter", """
+        SELECT a.id, a.patient_name, d.name, a.appointment_date, a.time_slot, a.status,
+               a.email, a.whatsapp, a.arrival_status, a.arrival_time
+        FROM appointments a
+        LEFT JOIN doctors d ON a.doctor_id = d.id
+        WHERE a.doctor_id = ?
+        ORDER BY a.appointment_date DESC, a.id DESC LIMIT ?
+    """, (1, 51)),
+    ("delete_appointment", "DELETE FROM appointments WHERE id = ?", (0,)),
+    ("get_slots: booked slots", "SELECT time_slot FROM appointments WHERE doctor_id=? AND appointment_date=? AND status='Confirmed'", (1, "2025-01-01")),
+    ("confirm_booking", """
+        INSERT INTO appointments (patient_name, doctor_id, appointment_date, time_slot, email, whatsapp, status)
+        VALUES (?, ?, ?, ?, ?, ?, 'Confirmed')
+    """, ("x", 1, "2025-01-01", "10:00 AM", None, None)),
+    ("get_all_appointments", """
+        SELECT a.id, a.patient_name, d.name, a.appointment_date, a.time_slot, a.status,
+               a.email, a.whatsapp, a.arrival_status, a.arrival_time
+        FROM appointments a
+        JOIN doctors d ON a.doctor_id = d.id
+        ORDER BY a.appointment_date DESC, a.id DESC LIMIT ?
+    """, (51,)),
+    ("check_in / process_checkin", "UPDATE appointments SET arrival_status = 'Arrived', arrival_time = ? WHERE id = ?", ("10:00 AM", 0)),
+    ("delete_appointment: slot lookup", "SELECT doctor_id, appointment_date, time_slot, status FROM appointments WHERE id = ?", (0,)),
+]
+
+# Whole-table loads of tiny tables (cached in memory by the app) are reported
+# but not treated as regressions.
+EXPECTED_SCANS = {
+    "dashboard: counters",
+    "doctor directory: load",
+}
+
+def is_full_scan(detail):
+    """A plan step is a full table scan when it scans without any index."""
+    return detail.startswith("SCAN") and "USING" not in detail
+
+def explain_all_queries(db_path='hospital_management.db'):
+    db = HospitalDB(db_path)
+    full_scans = []
+    try:
+        print("=" * 70)
+        print("EXPLAIN QUERY PLAN REPORT")
+        print("=" * 70)
+        for label, sql, params in APP_QUERIES:
+            print(f"\n[{label}]")
+            for row in db.fetch_all(f"EXPLAIN QUERY PLAN {sql}", params):
+                detail = row[3]
+                marker = ""
+                if is_full_scan(detail):
+                    if label in EXPECTED_SCANS:
+                        marker = "  (full scan, expected)"
+                    else:
+                        marker = "  <-- FULL SCAN"
+                        full_scans.append(label)
+                print(f"    {detail}{marker}")
+    finally:
+        db.close()
+
+    print("\n" + "=" * 70)
+    if full_scans:
+        print(f"{len(full_scans)} unexpected full table scan(s): {', '.join(full_scans)}")
+    else:
+        print("No unexpected full table scans.")
+    print("=" * 70)
+    return full_scans
+
+if __name__ == "__main__":
+    sys.exit(1 if explain_all_queries() else 0)
@@ -1,47 +1,25 @@
-import sqlite3
+import os
+import sys
 
-def add_missing_columns():
-    db_path = 'hospital_management.db' # Check karein aapki db file ka sahi naam
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+# Project root ko path mein add karein taake 'src' import ho sake
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    try:
-        # Email column add karne ke liye
-        cursor.execute("ALTER TABLE appointments ADD COLUMN email TEXT")
-        print("Email column added successfully!")
-    except sqlite3.OperationalError:
-        print("Email column pehle se mojood hai.")
-
-    try:
-        # Whatsapp column add karne ke liye
-        cursor.execute("ALTER TABLE appointments ADD COLUMN whatsapp TEXT")
-        print("Whatsapp column added successfully!")
-    except sqlite3.OperationalError:
-        print("Whatsapp column pehle se mojood hai.")
-
-    conn.commit()
-    conn.close()
-    print("Database Update Complete!")
-
-def update_db_schema():
-    db_path = 'hospital_management.db'
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+from src.database_manager import HospitalDB
+from src.migrations import MIGRATIONS, get_schema_version
 
+def update_db_schema(db_path='hospital_management.db'):
+    """Applies all pending versioned migrations (see src/migrations.py)."""
+    # HospitalDB runs the migration runner on startup
+    db = HospitalDB(db_path)
     try:
-        # Add arrival_status to track if patient is 'Pending', 'Arrived', or 'In-Consultation'
-        cursor.execute("ALTER TABLE appointments ADD COLUMN arrival_status TEXT DEFAULT 'Pending'")
-        
-        # Add arrival_time to log exactly when they scanned the QR code
-        cursor.execute("ALTER TABLE appointments ADD COLUMN arrival_time TEXT")
-        
-        conn.commit()
-        print("✅ Database schema updated successfully!")
-    except Exception as e:
-        print(f"⚠️ Column update note: {e}")
+        version = get_schema_version(db)
+        latest = MIGRATIONS[-1][0]
+        if version == latest:
+            print(f"✅ Database schema is up to date (v{version}).")
+        else:
+            print(f"⚠️ Schema at v{version}, expected v{latest}. Check logs/medai.log.")
     finally:
-        conn.close()
+        db.close()
 
 if __name__ == "__main__":
-    add_missing_columns()
-    update_db_schema()
\ No newline at end of file
+    update_db_schema()
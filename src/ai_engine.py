@@ -1,92 +1,219 @@
 import os
+import threading
+import time
+from textwrap import dedent
 from dotenv import load_dotenv
-from src.logger import logger
-from langchain_groq import ChatGroq # Gemini ki jagah Groq use hoga
+from src.logger import get_logger
 from langchain_core.prompts import PromptTemplate
 from langchain_core.messages import HumanMessage
+from src.context_packer import ContextPacker, estimate_tokens
+from src.answer_cache import normalize_query
+from src.single_flight import SingleFlight
+from src.llm_gateway import LLMGateway
+from src.metrics import metrics
 
 load_dotenv()
 
+logger = get_logger("ai_engine")
+
+# Compiled once at import; dedent drops the indentation that was sent as tokens
+RAG_PROMPT = PromptTemplate.from_template(dedent("""
+    SYSTEM ROLE:
+    You are a Specialized Medical Document Assistant. Your knowledge is strictly limited 
+    to the provided context.
+
+    STRICT RULES:
+    1. ONLY answer using the information found in the PROVIDED CONTEXT.
+    2. If the answer is NOT present in the context, do not use your own knowledge. 
+    3. In case of missing information, your ONLY response should be: 
+       "This information is not available in the provided medical records. Please consult a specialist."
+    4. Format the output professionally with bold headings and bullet points.
+
+    CONTEXT: 
+    {context}
+
+    QUESTION: 
+    {question}
+
+    STRICT MEDICAL ANSWER:
+    """).strip())
+
+TRIAGE_PROMPT = PromptTemplate.from_template(dedent("""
+    Symptoms: {symptoms}
+    Doctors List: {doctors}
+
+    TASK: Return ONLY the name of the most suitable doctor from the list provided.
+    RULES:
+    1. Do NOT provide any explanation.
+    2. Do NOT add titles if they are not in the list.
+    3. Return the name EXACTLY as it appears in the list.
+    4. If it is heart pain, you MUST return 'Dr. Asim Riaz'.
+    """).strip())
+
 class MedicalAIEngine:
-    def __init__(self, model_name: str = "llama-3.3-70b-versatile"):
-        self.api_key = os.getenv("GROQ_API_KEY")
-        
-        if not self.api_key:
-            logger.error("GROQ_API_KEY is missing in environment variables.")
-            raise ValueError("❌ GROQ_API_KEY is missing.")
+    def __init__(self, model_name: str = "llama-3.3-70b-versatile", llm=None, fallback_llm=None):
+        """`llm` / `fallback_llm` replace the Groq clients with any chat model exposing invoke/ainvoke/stream (benchmarks)."""
+        fallback_name = os.getenv("GROQ_FALLBACK_MODEL", "").strip()
+        if llm is not None:
+            self.api_key = None
+            primary, fallback = llm, fallback_llm
+            logger.info(f"AI Engine using injected chat model: {type(llm).__name__}")
+        else:
+            self.api_key = os.getenv("GROQ_API_KEY")
 
-        try:
-            # Groq is much faster and currently has a generous free tier
-            self.llm = ChatGroq(
-                groq_api_key=self.api_key,
-                model_name=model_name,
-                temperature=0.1,
-                max_tokens=1024
-            )
-            logger.info(f"Groq AI Engine Online: {model_name}")
-            print(f"✅ Groq Professional AI Online: {model_name}")
-        except Exception as e:
-            logger.error(f"Failed to initialize Groq: {str(e)}")
-            raise e
+            if not self.api_key:
+                logger.error("GROQ_API_KEY is missing in environment variables.")
+                raise ValueError("❌ GROQ_API_KEY is missing.")
 
-    def generate_response(self, query: str, retrieved_docs: list) -> str:
-        logger.info(f"Generating Groq response for: '{query}'")
-        
-        context_parts = []
-        for doc in retrieved_docs:
-            source = os.path.basename(doc.metadata.get('source', 'Ref'))
-            page = doc.metadata.get('page', 'N/A')
-            context_parts.append(f"SOURCE [{source}, Page {page}]:\n{doc.page_content}")
-        
-        context_text = "\n\n".join(context_parts)
+            try:
+                # Groq is much faster and currently has a generous free tier
+                primary = self._groq(model_name)
+                fallback = self._groq(fallback_name) if fallback_name else None
+                logger.info(f"Groq AI Engine Online: {model_name}"
+                            f"{f' (fallback: {fallback_name})' if fallback else ''}")
+                print(f"✅ Groq Professional AI Online: {model_name}")
+            except Exception as e:
+                logger.error(f"Failed to initialize Groq: {str(e)}")
+                raise e
 
-        template = """
-        SYSTEM ROLE:
-        You are a Specialized Medical Document Assistant. Your knowledge is strictly limited 
-        to the provided context.
+        # Rate limit, concurrency cap, retries, circuit breaker and fallback sit in front of Groq
+        self.llm = LLMGateway(primary, fallback_llm=fallback, model_name=model_name,
+                              fallback_name=fallback_name or "fallback")
+        self.packer = ContextPacker()
+        self._usage_lock = threading.Lock()
+        self.usage = {"requests": 0, "prompt_tokens": 0, "truncated": 0}
+        # Identical questions/symptoms arriving together share one Groq call
+        self.single_flight = SingleFlight()
 
-        STRICT RULES:
-        1. ONLY answer using the information found in the PROVIDED CONTEXT.
-        2. If the answer is NOT present in the context, do not use your own knowledge. 
-        3. In case of missing information, your ONLY response should be: 
-           "This information is not available in the provided medical records. Please consult a specialist."
-        4. Format the output professionally with bold headings and bullet points.
+    def _groq(self, model_name: str):
+        from langchain_groq import ChatGroq # Gemini ki jagah Groq use hoga
+        return ChatGroq(
+            groq_api_key=self.api_key,
+            model_name=model_name,
+            temperature=0.1,
+            max_tokens=1024,
+            # The gateway owns retries; each attempt is capped so its deadline holds
+            max_retries=0,
+            request_timeout=float(os.getenv("LLM_ATTEMPT_TIMEOUT", "10"))
+        )
 
-        CONTEXT: 
-        {context}
+    @staticmethod
+    def _rag_key(query, retrieved_docs):
+        docs = tuple(doc.id or hash(doc.page_content) for doc in retrieved_docs)
+        return ("rag", normalize_query(query), docs)
 
-        QUESTION: 
-        {question}
+    @staticmethod
+    def _triage_key(user_symptoms, doctors_list):
+        return ("triage", normalize_query(user_symptoms), hash(str(doctors_list)))
 
-        STRICT MEDICAL ANSWER:
-        """
+    def _build_prompt(self, query: str, retrieved_docs: list) -> str:
+        context_text, stats = self.packer.pack(retrieved_docs)
+        final_prompt = RAG_PROMPT.format(context=context_text, question=query)
+
+        prompt_tokens = estimate_tokens(final_prompt)
+        with self._usage_lock:
+            self.usage["requests"] += 1
+            self.usage["prompt_tokens"] += prompt_tokens
+            self.usage["truncated"] += int(stats["truncated"])
+        logger.info(f"Prompt tokens sent: ~{prompt_tokens} (context {stats['context_tokens']}/"
+                    f"{self.packer.max_tokens}, {stats['chunks']} chunks -> {stats['passages']} passages"
+                    f"{', truncated' if stats['truncated'] else ''})")
+        return final_prompt
+
+    def generate_response(self, query: str, retrieved_docs: list) -> str:
+        """Answers from the retrieved context; concurrent identical requests share one call."""
+        return self.single_flight.do(self._rag_key(query, retrieved_docs),
+                                     lambda: self._generate_response(query, retrieved_docs))
+
+    def _generate_response(self, query: str, retrieved_docs: list) -> str:
+        logger.debug("Generating Groq response (%d-char query)", len(query))
         
         try:
-            prompt_wrapper = PromptTemplate.from_template(template)
-            final_prompt = prompt_wrapper.format(context=context_text, question=query)
+            final_prompt = self._build_prompt(query, retrieved_docs)
             
-            response = self.llm.invoke([HumanMessage(content=final_prompt)])
+            with metrics.timer("llm_generate"):
+                response = self.llm.invoke([HumanMessage(content=final_prompt)])
             return response.content
 
         except Exception as e:
             logger.error(f"Groq Generation Error: {str(e)}", exc_info=True)
             return "❌ AI Error: Groq quota or connection issue."
+
+    def generate_response_stream(self, query: str, retrieved_docs: list):
+        """
+        Streaming variant of generate_response: yields answer text pieces as
+        Groq produces them. On failure it yields the same error string as
+        generate_response (after any text already sent).
+        """
+        logger.debug("Streaming Groq response (%d-char query)", len(query))
+
+        try:
+            final_prompt = self._build_prompt(query, retrieved_docs)
+
+            start, first = time.perf_counter(), True
+            for chunk in self.llm.stream([HumanMessage(content=final_prompt)]):
+                if chunk.content:
+                    if first:
+                        metrics.observe("stage_seconds", time.perf_counter() - start, stage="llm_first_token")
+                        first = False
+                    yield chunk.content
+            metrics.observe("stage_seconds", time.perf_counter() - start, stage="llm_stream")
+
+        except Exception as e:
+            metrics.error("llm_stream")
+            logger.error(f"Groq Streaming Error: {str(e)}", exc_info=True)
+            yield "❌ AI Error: Groq quota or connection issue."
         
         
+    async def agenerate_response(self, query: str, retrieved_docs: list) -> str:
+        """Async variant of generate_response using the client's native async call."""
+        return await self.single_flight.ado(self._rag_key(query, retrieved_docs),
+                                            lambda: self._agenerate_response(query, retrieved_docs))
+
+    async def _agenerate_response(self, query: str, retrieved_docs: list) -> str:
+        logger.debug("Generating Groq response, async (%d-char query)", len(query))
+
+        try:
+            final_prompt = self._build_prompt(query, retrieved_docs)
+
+            with metrics.timer("llm_generate"):
+                response = await self.llm.ainvoke([HumanMessage(content=final_prompt)])
+            return response.content
+
+        except Exception as e:
+            logger.error(f"Groq Generation Error: {str(e)}", exc_info=True)
+            return "❌ AI Error: Groq quota or connection issue."
+
+    def _build_triage_prompt(self, user_symptoms, doctors_list) -> str:
+        return TRIAGE_PROMPT.format(symptoms=user_symptoms, doctors=doctors_list)
+
     def recommend_doctor(self, user_symptoms, doctors_list):
-        prompt = f"""
-        Symptoms: {user_symptoms}
-        Doctors List: {doctors_list}
-
-        TASK: Return ONLY the name of the most suitable doctor from the list provided.
-        RULES:
-        1. Do NOT provide any explanation.
-        2. Do NOT add titles if they are not in the list.
-        3. Return the name EXACTLY as it appears in the list.
-        4. If it is heart pain, you MUST return 'Dr. Asim Riaz'.
-        """
-        response = self.llm.invoke([HumanMessage(content=prompt)])
-        return response.content.strip()
+        """Doctor name suggested by the LLM, or None when it is unavailable."""
+        def call():
+            prompt = self._build_triage_prompt(user_symptoms, doctors_list)
+            try:
+                with metrics.timer("llm_triage"):
+                    response = self.llm.invoke([HumanMessage(content=prompt)])
+                return response.content.strip()
+            except Exception as e:
+                logger.error(f"Groq Triage Error: {str(e)}")
+                return None
+
+        return self.single_flight.do(self._triage_key(user_symptoms, doctors_list), call)
+
+    async def arecommend_doctor(self, user_symptoms, doctors_list):
+        """Async variant of recommend_doctor."""
+        async def call():
+            prompt = self._build_triage_prompt(user_symptoms, doctors_list)
+            try:
+                with metrics.timer("llm_triage"):
+                    response = await self.llm.ainvoke([HumanMessage(content=prompt)])
+                return response.content.strip()
+            except Exception as e:
+                logger.error(f"Groq Triage Error: {str(e)}")
+                return None
+
+        return await self.single_flight.ado(self._triage_key(user_symptoms, doctors_list), call)
 
 if __name__ == "__main__":
     engine = MedicalAIEngine()
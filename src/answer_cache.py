@@ -0,0 +1,138 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from src.logger import logger
+from src.metrics import metrics
+
+def normalize_query(query: str) -> str:
+    """Lower-cases, collapses whitespace and drops trailing punctuation."""
+    text = " ".join(query.casefold().split())
+    return re.sub(r"[\s?.!]+$", "", text)
+
+class SemanticAnswerCache:
+    """
+    Bounded TTL cache of final /chat answers.
+
+    Lookups first try the normalized query string, then the nearest cached
+    query embedding; a cosine similarity at or above `threshold` counts as a
+    hit. Entries are tied to the vector index version and are dropped when the
+    index is re-ingested. Stats report the hit ratio and the upstream time
+    (embedding search + LLM) that hits avoided.
+    """
+    def __init__(self, embeddings=None, max_entries=512, ttl_seconds=3600,
+                 threshold=0.92, index_version_fn=None):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.index_version_fn = index_version_fn
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # normalized query -> (answer, unit vector or None, created_at, cost_seconds)
+        self._matrix = None
+        self._matrix_keys = []
+        self._index_version = index_version_fn() if index_version_fn else None
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+    # --- Embedding helpers ---
+
+    def embed(self, query: str):
+        """Returns the unit-length query embedding, or None if embeddings are unavailable."""
+        if self.embeddings is None:
+            return None
+        try:
+            with metrics.timer("embedding"):
+                vec = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+            norm = np.linalg.norm(vec)
+            return vec / norm if norm else None
+        except Exception as e:
+            logger.warning(f"Answer cache embedding failed, using exact match only: {e}")
+            return None
+
+    def _rebuild_matrix(self):
+        keys = [k for k, e in self._entries.items() if e[1] is not None]
+        self._matrix_keys = keys
+        self._matrix = np.vstack([self._entries[k][1] for k in keys]) if keys else None
+
+    # --- Core API ---
+
+    def _check_index_version(self):
+        if self.index_version_fn is None:
+            return
+        version = self.index_version_fn()
+        if version != self._index_version:
+            logger.info("Vector index re-ingested; clearing answer cache.")
+            self.clear()
+            self._index_version = version
+
+    def _expired(self, entry, now):
+        return now - entry[2] > self.ttl_seconds
+
+    def lookup(self, query: str, vector=None):
+        """Returns a cached answer for the query (exact or near-duplicate), or None."""
+        self._check_index_version()
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry, now):
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                self._stats["saved_seconds"] += entry[3]
+                return entry[0]
+
+            if vector is not None and self._matrix is not None:
+                scores = self._matrix @ vector
+                best = int(np.argmax(scores))
+                match = self._entries.get(self._matrix_keys[best])
+                if scores[best] >= self.threshold and match is not None and not self._expired(match, now):
+                    self._entries.move_to_end(self._matrix_keys[best])
+                    self._stats["semantic_hits"] += 1
+                    self._stats["saved_seconds"] += match[3]
+                    return match[0]
+
+            self._stats["misses"] += 1
+            return None
+
+    def store(self, query: str, vector, answer: str, cost_seconds: float):
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = (answer, vector, time.time(), cost_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._rebuild_matrix()
+
+    def get_or_compute(self, query: str, compute, cacheable=lambda answer: True):
+        """
+        Serves `query` from cache or calls `compute(query_vector)` and caches its answer.
+        The query vector is passed on so retrieval can reuse it instead of embedding twice.
+        """
+        vector = self.embed(query)
+        cached = self.lookup(query, vector)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        answer = compute(vector)
+        if cacheable(answer):
+            self.store(query, vector, answer, time.perf_counter() - start)
+        return answer
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._rebuild_matrix()
+
+    def stats(self):
+        with self._lock:
+            hits = self._stats["exact_hits"] + self._stats["semantic_hits"]
+            total = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "saved_seconds": round(self._stats["saved_seconds"], 3),
+                "hit_ratio": round(hits / total, 4) if total else 0.0,
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+            }
@@ -0,0 +1,98 @@
+import base64
+import json
+from src.database_manager import db_manager
+
+LISTING_COLUMNS = """
+    a.id, a.patient_name, d.name, a.appointment_date, a.time_slot, a.status,
+    a.email, a.whatsapp, a.arrival_status, a.arrival_time
+"""
+
+def row_to_dict(r):
+    """Maps a LISTING_COLUMNS row to the dict shape used by the admin views."""
+    return {
+        "id": r[0], "patient": r[1], "doctor": r[2], "date": r[3],
+        "time": r[4], "status": r[5], "email": r[6], "whatsapp": r[7],
+        "arrival_status": r[8], "arrival_time": r[9]
+    }
+
+def encode_cursor(date, apt_id):
+    raw = json.dumps([date, apt_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(token):
+    """Returns (date, id) from an opaque page cursor; raises ValueError if malformed."""
+    try:
+        date, apt_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return date, int(apt_id)
+    except Exception:
+        raise ValueError("Invalid page cursor.")
+
+class AppointmentListing:
+    """
+    Keyset-paginated appointment listings, newest first.
+
+    Pages are ordered by (appointment_date DESC, id DESC) and the cursor is the
+    last row's (date, id), so every page is an index range read no matter how
+    deep into the history it is. `iter_rows` streams the same query straight
+    from the cursor for NDJSON exports.
+    """
+    MAX_LIMIT = 500
+
+    def _build_query(self, doctor_id=None, date_from=None, date_to=None, status=None,
+                     after=None, require_doctor=False):
+        join = "JOIN" if require_doctor else "LEFT JOIN"
+        clauses, params = [], []
+        if doctor_id is not None:
+            clauses.append("a.doctor_id = ?")
+            params.append(doctor_id)
+        if date_from:
+            clauses.append("a.appointment_date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("a.appointment_date <= ?")
+            params.append(date_to)
+        if status:
+            clauses.append("a.status = ?")
+            params.append(status)
+        if after is not None:
+            # Row-value comparison lets SQLite seek in idx_appointments_date
+            clauses.append("(a.appointment_date, a.id) < (?, ?)")
+            params.extend(after)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"""
+            SELECT {LISTING_COLUMNS}
+            FROM appointments a
+            {join} doctors d ON a.doctor_id = d.id
+            {where}
+            ORDER BY a.appointment_date DESC, a.id DESC
+        """
+        return query, params
+
+    def get_page(self, cursor=None, limit=50, **filters):
+        """Returns (rows, next_cursor); next_cursor is None on the last page."""
+        limit = max(1, min(int(limit), self.MAX_LIMIT))
+        after = decode_cursor(cursor) if cursor else None
+        query, params = self._build_query(after=after, **filters)
+
+        # Fetch one extra row to know whether another page exists
+        rows = db_manager.fetch_all(f"{query} LIMIT ?", (*params, limit + 1))
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][3], rows[-1][0])
+        return rows, next_cursor
+
+    def iter_rows(self, batch_size=200, **filters):
+        """Yields matching rows in order without materialising the full result."""
+        query, params = self._build_query(**filters)
+        with db_manager.read() as cur:
+            cur.execute(query, params)
+            while True:
+                batch = cur.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from batch
+
+# Global instance
+apt_listing = AppointmentListing()
@@ -1,11 +1,14 @@
-from src.database_manager import db_manager
-from src.ai_engine import MedicalAIEngine
+from src.doctor_directory import doctor_directory
+from src.triage import symptom_triage
+from src.services import services
 from src.logger import logger
-from datetime import datetime, timedelta
+from src.slot_engine import build_slot_grid
 
 class AppointmentManager:
-    def __init__(self):
-        self.ai_engine = MedicalAIEngine()
+    @property
+    def ai_engine(self):
+        # Shared, lazily built engine (no second Groq client per importer)
+        return services.get("ai_brain")
 
     def get_specialists_by_query(self, symptoms: str):
         """
@@ -13,13 +16,15 @@ class AppointmentManager:
         This fixes the 'No specialist found' error by broadening the search.
         """
         try:
-            # 1. Get minimal list for AI context
-            doctors_data = db_manager.get_all_doctors_minimal()
-            
-            # 2. AI identifies the specialization needed
-            # (e.g., Returns 'Cardiologist' instead of just one name)
-            recommendation = self.ai_engine.recommend_doctor(symptoms, doctors_data)
+            # 1-2. Local triage identifies the specialization (e.g. 'Cardiologist');
+            # the AI only gets the minimal doctor list when the classifier is unsure
+            recommendation = symptom_triage.recommend(
+                symptoms,
+                lambda s: self.ai_engine.recommend_doctor(s, doctor_directory.minimal())
+            )
             logger.info(f"AI triage result: {recommendation}")
+            if not recommendation:
+                return []
 
             # 3. Flexible search: Try matching by Specialization FIRST
             matched_doctors = self.get_doctors_by_specialty(recommendation)
@@ -27,9 +32,7 @@ class AppointmentManager:
             # 4. Fallback: If no specialty match, try matching by Doctor Name
             if not matched_doctors:
                 clean_name = recommendation.replace("Dr.", "").replace("Prof.", "").strip()
-                query = "SELECT * FROM doctors WHERE name LIKE ?"
-                db_manager.cursor.execute(query, (f"%{clean_name}%",))
-                matched_doctors = db_manager.cursor.fetchall()
+                matched_doctors = doctor_directory.search_name(clean_name)
 
             return matched_doctors
             
@@ -38,40 +41,29 @@ class AppointmentManager:
             return []
 
     def get_doctors_by_specialty(self, specialization: str):
-        """Fetches all doctors from SQL based on specialization."""
+        """Fetches all doctors matching a specialization from the in-memory directory."""
         try:
-            query = "SELECT * FROM doctors WHERE specialization LIKE ?"
-            db_manager.cursor.execute(query, (f"%{specialization}%",))
-            return db_manager.cursor.fetchall()
+            # Exact (case-insensitive) match first, then partial (e.g. 'Cardio' for 'Cardiologist')
+            return doctor_directory.by_specialty(specialization)
         except Exception as e:
             logger.error(f"Database specialty search error: {e}")
             return []
 
     def generate_time_slots(self, start_str, end_str):
         """Divides working hours into professional 20-min booking intervals."""
-        slots = []
-        # Support for common time formats
-        time_format = "%I:%M %p" 
-        try:
-            start_dt = datetime.strptime(start_str.strip(), time_format)
-            end_dt = datetime.strptime(end_str.strip(), time_format)
-            
-            current = start_dt
-            while current + timedelta(minutes=20) <= end_dt:
-                slots.append(current.strftime(time_format))
-                current += timedelta(minutes=20)
-        except Exception as e:
-            logger.error(f"Slot Generation Error for {start_str}-{end_str}: {e}")
-        return slots
+        return build_slot_grid(start_str, end_str)
 
     def get_ai_recommendation(self, symptoms: str):
         """Single doctor recommendation logic (Old version maintained for compatibility)."""
         try:
-            doctors_data = db_manager.get_all_doctors_minimal()
+            doctors_data = doctor_directory.minimal()
             recommended_name = self.ai_engine.recommend_doctor(symptoms, doctors_data)
+            if not recommended_name:
+                return {"status": "error", "message": "AI triage is temporarily unavailable."}
             
             clean_name = recommended_name.replace("Dr.", "").replace("Prof.", "").strip()
-            doc_details = db_manager.get_doctor_details_by_name(clean_name)
+            matches = doctor_directory.search_name(clean_name)
+            doc_details = matches[0] if matches else None
 
             if doc_details:
                 return {
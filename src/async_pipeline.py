@@ -0,0 +1,70 @@
+import asyncio
+import time
+from src.doctor_directory import doctor_directory, doctor_to_dict
+from src.logger import logger
+
+class AsyncAIPipeline:
+    """
+    asyncio implementation of the /chat and /get_specialists flows.
+
+    Network waits (Groq, vector search) are awaited instead of holding a
+    worker thread, so one process can keep many AI requests in flight.
+    Blocking pieces (model inference, the Pinecone client, SQLite reloads)
+    run on worker threads. `max_concurrency` caps in-flight AI requests;
+    callers beyond it wait for a slot. Services come from the registry and
+    are built off the event loop the first time they are needed.
+    """
+    def __init__(self, services, triage, max_concurrency=200):
+        self.services = services
+        self.triage = triage
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _service(self, name):
+        if self.services.is_ready(name):
+            return self.services.get(name)
+        return await asyncio.to_thread(self.services.get, name)
+
+    async def chat(self, query: str) -> str:
+        """Answer for a clinical query (cache -> retrieval -> LLM)."""
+        async with self._semaphore:
+            answer_cache = await self._service("answer_cache")
+            query_vector = await asyncio.to_thread(answer_cache.embed, query)
+            cached = answer_cache.lookup(query, query_vector)
+            if cached is not None:
+                return cached
+
+            retriever = await self._service("retriever")
+            ai_brain = await self._service("ai_brain")
+            start = time.perf_counter()
+            context_docs = await retriever.aretrieve(query, top_k=3, query_embedding=query_vector)
+            answer = await ai_brain.agenerate_response(query, context_docs)
+
+            # Answers produced without the vector index, or AI error strings, are never cached
+            if retriever.vectorstore is not None and not answer.startswith("❌"):
+                answer_cache.store(query, query_vector, answer, time.perf_counter() - start)
+            return answer
+
+    async def specialists(self, symptoms: str) -> list:
+        """Doctor cards for the symptoms (local triage, LLM only when unsure)."""
+        async with self._semaphore:
+            # Independent steps overlap: the doctor list (may reload from SQLite)
+            # and the local classifier (may run the embedding model)
+            doctors_minimal, local_result = await asyncio.gather(
+                asyncio.to_thread(doctor_directory.minimal),
+                asyncio.to_thread(self.triage.classify, symptoms)
+            )
+
+            async def ask_llm(s):
+                ai_brain = await self._service("ai_brain")
+                return await ai_brain.arecommend_doctor(s, doctors_minimal)
+
+            suggestion = await self.triage.arecommend(
+                symptoms,
+                ask_llm,
+                local_result=local_result
+            )
+            logger.info(f"Async triage suggestion: {suggestion}")
+
+            matched = doctor_directory.match_suggestion(suggestion)
+            return [doctor_to_dict(doc) for doc in matched]
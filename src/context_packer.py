@@ -0,0 +1,92 @@
+import math
+import os
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English/medical text)."""
+    return math.ceil(len(text) / 4)
+
+class ContextPacker:
+    """
+    Turns retrieved chunks into the CONTEXT block of the RAG prompt.
+
+    Chunks from the same source and page that overlap or touch (the splitter
+    uses a 100-character overlap) are stitched back into one passage, exact
+    duplicates are dropped, and passages are added in retrieval order until
+    `max_tokens` (CONTEXT_TOKEN_BUDGET) is reached. The last passage that does
+    not fit is cut at a sentence boundary. Every passage keeps its
+    SOURCE [file, Page n] citation.
+    """
+    def __init__(self, max_tokens: int = None, token_counter=estimate_tokens, min_tail_tokens: int = 60):
+        self.max_tokens = max_tokens or int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+        self.count_tokens = token_counter
+        self.min_tail_tokens = min_tail_tokens
+
+    @staticmethod
+    def _citation(meta):
+        source = os.path.basename(meta.get("source", "Ref"))
+        return f"SOURCE [{source}, Page {meta.get('page', 'N/A')}]"
+
+    def merge(self, docs):
+        """Returns [(citation, text)] with overlapping chunks of the same page merged, in rank order."""
+        groups, order = {}, []
+        for doc in docs:
+            key = (doc.metadata.get("source"), doc.metadata.get("page"))
+            if key not in groups:
+                groups[key] = []
+                order.append(key)
+            groups[key].append(doc)
+
+        passages = []
+        for key in order:
+            citation = self._citation(groups[key][0].metadata)
+            positioned = sorted((d for d in groups[key] if d.metadata.get("start_index") is not None),
+                                key=lambda d: d.metadata["start_index"])
+            spans = []      # [start, end, text]
+            for doc in positioned:
+                start, text = doc.metadata["start_index"], doc.page_content
+                if spans and start <= spans[-1][1]:
+                    last = spans[-1]
+                    tail = text[last[1] - start:]
+                    last[2] += tail
+                    last[1] = max(last[1], start + len(text))
+                else:
+                    spans.append([start, start + len(text), text])
+            texts = [s[2] for s in spans]
+
+            # Chunks without offsets cannot be stitched; only exact duplicates are dropped
+            for doc in groups[key]:
+                if doc.metadata.get("start_index") is None and doc.page_content not in texts:
+                    texts.append(doc.page_content)
+            passages.extend((citation, text) for text in texts)
+        return passages
+
+    def _truncate(self, text, max_tokens):
+        cut = text[:max_tokens * 4]
+        while cut and self.count_tokens(cut) > max_tokens:
+            cut = cut[:int(len(cut) * 0.9)]
+        # Prefer ending on a sentence, then on a word
+        boundary = max(cut.rfind(". "), cut.rfind(".\n"))
+        if boundary > len(cut) // 2:
+            return cut[:boundary + 1]
+        return cut.rsplit(" ", 1)[0] + " ..."
+
+    def pack(self, docs):
+        """Returns (context text, stats) within the token budget."""
+        parts, used, truncated = [], 0, False
+        passages = self.merge(docs)
+        for citation, text in passages:
+            block = f"{citation}:\n{text}"
+            tokens = self.count_tokens(block)
+            remaining = self.max_tokens - used
+            if tokens > remaining:
+                truncated = True
+                if remaining - self.count_tokens(citation) >= self.min_tail_tokens:
+                    block = f"{citation}:\n{self._truncate(text, remaining - self.count_tokens(citation) - 2)}"
+                    parts.append(block)
+                    used += self.count_tokens(block)
+                break
+            parts.append(block)
+            used += tokens
+
+        stats = {"chunks": len(docs), "passages": len(parts), "context_tokens": used, "truncated": truncated}
+        return "\n\n".join(parts), stats
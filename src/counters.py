@@ -0,0 +1,91 @@
+import atexit
+import threading
+import time
+from datetime import date
+from src.database_manager import db_manager
+from src.write_queue import write_queue
+from src.logger import logger
+
+class AIQueryCounter:
+    """
+    Per-day, per-endpoint AI query counts.
+
+    `record()` only bumps an in-memory counter; a background thread flushes
+    the pending increments every `flush_interval` seconds as one upsert
+    through the group-commit writer, so counting never adds a write to the
+    request path. Today's total is served from memory.
+    """
+    def __init__(self, db, writer, flush_interval=5.0):
+        self.db = db
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # Held for a whole flush, so nobody sees a batch both committed and unflushed
+        self._flush_lock = threading.Lock()
+        self._pending = {}      # (day, endpoint) -> increments not yet handed to the writer
+        self._day = None
+        self._day_total = 0
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="hms-ai-counter", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def record(self, endpoint):
+        """Counts one AI query for `endpoint` (e.g. 'chat', 'triage')."""
+        day = date.today().isoformat()
+        with self._lock:
+            key = (day, endpoint)
+            self._pending[key] = self._pending.get(key, 0) + 1
+            if self._day == day:
+                self._day_total += 1
+            self._ensure_started()
+
+    def today(self):
+        """Returns today's AI query count across all endpoints."""
+        day = date.today().isoformat()
+        with self._lock:
+            if self._day == day:
+                return self._day_total
+        # No flush is between its commit and clearing its batch while we read,
+        # so every increment is either in the table or pending, never both
+        with self._flush_lock, self._lock:
+            if self._day != day:
+                row = self.db.fetch_one("SELECT COALESCE(SUM(count), 0) FROM ai_query_stats WHERE day = ?", (day,))
+                unflushed = sum(n for (d, _), n in self._pending.items() if d == day)
+                self._day, self._day_total = day, row[0] + unflushed
+            return self._day_total
+
+    def flush(self):
+        """Persists pending increments in one upsert; failed increments are kept for the next flush."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, {}
+
+            rows = [(day, endpoint, n) for (day, endpoint), n in batch.items()]
+            try:
+                self.writer.run(lambda cur: cur.executemany('''
+                    INSERT INTO ai_query_stats (day, endpoint, count) VALUES (?, ?, ?)
+                    ON CONFLICT(day, endpoint) DO UPDATE SET count = count + excluded.count
+                ''', rows))
+            except Exception as e:
+                logger.error(f"AI counter flush failed: {e}")
+                with self._lock:
+                    for key, n in batch.items():
+                        self._pending[key] = self._pending.get(key, 0) + n
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+def get_dashboard_counts():
+    """Returns the trigger-maintained row counts, e.g. {'appointments': 12, 'doctors': 10}."""
+    return dict(db_manager.fetch_all("SELECT name, value FROM stats_counters"))
+
+# Global instance
+ai_query_counter = AIQueryCounter(db_manager, write_queue)
@@ -1,63 +1,164 @@
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from src.logger import logger
+from src.metrics import metrics
+from src.migrations import apply_migrations
 
 class HospitalDB:
-    def __init__(self, db_path="hospital_management.db"):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.setup_tables()
+    """
+    SQLite access layer for the HMS.
+
+    Reads borrow a pooled connection and run in parallel (WAL mode), while all
+    writes go through one dedicated connection guarded by a lock, so only
+    writers contend with each other. Cursors are short-lived and never shared.
+    The database is opened (and migrated) on first use, not at import.
+    """
+    def __init__(self, db_path="hospital_management.db", pool_size=8, busy_timeout=5.0):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._pool_size = pool_size
+        self._opened = 0
+        self._pool_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # Reentrant: the migrations run during open go back through write()
+        self._open_lock = threading.RLock()
+        self._write_conn = None
+        self._ready = False
+        self._doctors_listeners = []
+
+    def _ensure_open(self):
+        """Opens the writer connection and applies migrations once, on first use."""
+        if self._ready:
+            return
+        with self._open_lock:
+            if self._ready or self._write_conn is not None:
+                return
+            self._write_conn = self._connect()
+            try:
+                self.setup_tables()
+            except Exception:
+                # Not ready: drop the writer so the next call retries the migrations
+                self._write_conn.close()
+                self._write_conn = None
+                raise
+            self._ready = True
+
+    def _connect(self):
+        """Opens a new connection configured for concurrent access."""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _acquire(self):
+        """Takes an idle read connection, opening a new one while under the pool limit."""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if self._opened < self._pool_size:
+                self._opened += 1
+                return self._connect()
+        return self._pool.get(timeout=self.busy_timeout)
+
+    @contextmanager
+    def read(self):
+        """Yields a short-lived cursor on a pooled read connection."""
+        self._ensure_open()
+        with metrics.timer("db_read"):
+            conn = self._acquire()
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+                # Ends the implicit read transaction so the WAL snapshot is released
+                conn.rollback()
+                self._pool.put(conn)
+
+    @contextmanager
+    def write(self):
+        """Yields a cursor inside a single write transaction; commits on success, rolls back on error."""
+        self._ensure_open()
+        with metrics.timer("db_write"), self._write_lock:
+            cursor = self._write_conn.cursor()
+            try:
+                yield cursor
+                self._write_conn.commit()
+            except Exception:
+                self._write_conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def fetch_all(self, query, params=()):
+        """Runs a read query and returns every row."""
+        with self.read() as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+    def fetch_one(self, query, params=()):
+        """Runs a read query and returns the first row (or None)."""
+        with self.read() as cur:
+            cur.execute(query, params)
+            return cur.fetchone()
+
+    def execute(self, query, params=()):
+        """Runs a single write statement in its own transaction and returns the affected row count."""
+        with self.write() as cur:
+            cur.execute(query, params)
+            return cur.rowcount
+
+    def close(self):
+        """Closes the writer and every idle pooled connection."""
+        with self._open_lock, self._write_lock:
+            if self._write_conn is not None:
+                self._write_conn.close()
+            self._write_conn, self._ready = None, False
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
 
     def setup_tables(self):
-        """Creates doctors and appointments tables if they do not exist."""
+        """Brings the schema up to date by applying pending versioned migrations."""
         try:
-            # Doctors Table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS doctors (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT,
-                    specialization TEXT,
-                    start_time TEXT,
-                    end_time TEXT,
-                    room TEXT,
-                    fee TEXT
-                )
-            ''')
-            
-            # Appointments Table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS appointments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    patient_name TEXT,
-                    doctor_id INTEGER,
-                    appointment_date TEXT,
-                    time_slot TEXT,
-                    status TEXT DEFAULT 'Confirmed',
-                    FOREIGN KEY(doctor_id) REFERENCES doctors(id)
-                )
-            ''')
-            self.conn.commit()
-            logger.info("Database tables initialized successfully.")
+            version = apply_migrations(self)
+            logger.info(f"Database tables initialized successfully (schema v{version}).")
         except Exception as e:
             logger.error(f"Database setup error: {e}")
+            raise
+
+    def add_doctors_listener(self, callback):
+        """Registers `callback()`, called after this process commits a change to the doctors table."""
+        self._doctors_listeners.append(callback)
+
+    def doctors_changed(self):
+        for callback in self._doctors_listeners:
+            callback()
 
     def add_doctor(self, name, spec, start, end, room, fee):
         """Inserts a new doctor record into the database."""
-        self.cursor.execute('''
+        self.execute('''
             INSERT INTO doctors (name, specialization, start_time, end_time, room, fee)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (name, spec, start, end, room, fee))
-        self.conn.commit()
+        self.doctors_changed()
 
     def get_all_doctors_minimal(self):
         """Returns a list of doctors and their specialties for the AI to analyze."""
-        self.cursor.execute("SELECT name, specialization FROM doctors")
-        return self.cursor.fetchall()
+        return self.fetch_all("SELECT name, specialization FROM doctors WHERE active = 1")
 
     def get_doctor_details_by_name(self, doctor_name):
         """Fetches full doctor details by name using flexible matching."""
-        query = "SELECT * FROM doctors WHERE name LIKE ?"
-        self.cursor.execute(query, (f"%{doctor_name}%",))
-        return self.cursor.fetchone()
+        query = "SELECT * FROM doctors WHERE active = 1 AND name LIKE ?"
+        return self.fetch_one(query, (f"%{doctor_name}%",))
 
 # Global instance
-db_manager = HospitalDB()
\ No newline at end of file
+db_manager = HospitalDB()
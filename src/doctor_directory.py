@@ -0,0 +1,161 @@
+import re
+import threading
+import time
+from src.database_manager import db_manager
+from src.logger import logger
+
+DOCTOR_COLUMNS = "id, name, specialization, start_time, end_time, room, fee"
+
+def normalize(text):
+    """Lower-cases and collapses whitespace so lookups behave like SQLite LIKE."""
+    return " ".join(str(text or "").casefold().split())
+
+def name_tokens(text):
+    return set(re.findall(r"[a-z0-9]+", normalize(text)))
+
+def doctor_to_dict(doc):
+    """JSON shape used by the booking UI."""
+    return {
+        "id": doc[0], "name": doc[1], "specialization": doc[2],
+        "time": f"{doc[3]} - {doc[4]}", "room": doc[5], "fee": doc[6]
+    }
+
+class DoctorDirectory:
+    """
+    In-process copy of the active rows of the doctors table (retired doctors
+    stay in SQLite for their appointments but are not served).
+
+    Rows keep the `SELECT *` tuple shape (id, name, specialization,
+    start_time, end_time, room, fee) so callers can use them exactly like
+    SQLite results. The directory is indexed by id, normalized specialization
+    and name tokens, and reloads when the `doctors_version` stamp changes.
+    Writes in this process (add_doctor, sync_doctors.py) invalidate it
+    directly, so the next read reloads. Triggers bump that stamp on every
+    write to the doctors table, which is how changes from other processes
+    are noticed: the stamp is checked at most once every `check_interval`
+    seconds.
+    """
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._stale = False
+        self._rows = []
+        self._by_id = {}
+        self._by_specialty = {}
+        self._by_token = {}
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Registers `callback(old_by_id, new_by_id)`, called after each reload."""
+        self._listeners.append(callback)
+
+    def invalidate(self):
+        """Forces a version check (and reload if stale) on the next read."""
+        self._stale = True
+
+    def _current_version(self):
+        row = db_manager.fetch_one("SELECT value FROM stats_counters WHERE name = 'doctors_version'")
+        return row[0] if row else 0
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._version is not None and not self._stale and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            if self._version is not None and not self._stale and now - self._checked_at < self.check_interval:
+                return
+            # Cleared before reading, so an invalidate() during the check is not lost
+            self._stale = False
+            version = self._current_version()
+            self._checked_at = now
+            if version != self._version:
+                self._load(version)
+
+    def _load(self, version):
+        """Rebuilds every index from one query. Caller holds the lock."""
+        rows = [tuple(r) for r in db_manager.fetch_all(f"SELECT {DOCTOR_COLUMNS} FROM doctors WHERE active = 1 ORDER BY id")]
+        by_id, by_specialty, by_token = {}, {}, {}
+        for row in rows:
+            by_id[row[0]] = row
+            by_specialty.setdefault(normalize(row[2]), []).append(row)
+            for token in name_tokens(row[1]):
+                by_token.setdefault(token, set()).add(row[0])
+
+        old_by_id = self._by_id
+        self._rows, self._by_id, self._by_specialty, self._by_token = rows, by_id, by_specialty, by_token
+        self._version = version
+        logger.info(f"Doctor directory loaded {len(rows)} doctors (version {version}).")
+        for callback in self._listeners:
+            try:
+                callback(old_by_id, by_id)
+            except Exception as e:
+                logger.error(f"Doctor directory listener failed: {e}")
+
+    # --- Reads ---
+
+    def all(self):
+        self._ensure_fresh()
+        return list(self._rows)
+
+    def minimal(self):
+        """(name, specialization) pairs, as used for the AI prompt."""
+        self._ensure_fresh()
+        return [(r[1], r[2]) for r in self._rows]
+
+    def get(self, doctor_id):
+        self._ensure_fresh()
+        try:
+            return self._by_id.get(int(doctor_id))
+        except (TypeError, ValueError):
+            return None
+
+    def by_specialty(self, specialization):
+        """Exact (case-insensitive) specialty match, falling back to a substring match."""
+        self._ensure_fresh()
+        key = normalize(specialization)
+        exact = self._by_specialty.get(key)
+        if exact:
+            return list(exact)
+        return [r for r in self._rows if key in normalize(r[2])]
+
+    def search_name(self, query):
+        """Substring match on doctor names, narrowed through the name-token index."""
+        self._ensure_fresh()
+        needle = normalize(query)
+        tokens = name_tokens(query)
+        if not tokens:
+            return [r for r in self._rows if needle in normalize(r[1])]
+
+        # Every query token must occur inside some name token; the token
+        # vocabulary is much smaller than the table, so this prunes cheaply
+        candidates = None
+        for token in tokens:
+            ids = {i for t, s in self._by_token.items() if token in t for i in s}
+            candidates = ids if candidates is None else candidates & ids
+        return [self._by_id[i] for i in sorted(candidates) if needle in normalize(self._by_id[i][1])]
+
+    def match_suggestion(self, suggestion, fallback_count=3):
+        """
+        Resolves a triage suggestion (a specialty or a doctor name) to doctors:
+        specialty match, then name match, then the first few doctors.
+        """
+        # No suggestion (LLM unavailable) goes straight to the emergency fallback
+        suggestion = (suggestion or "").strip()
+
+        # 1. Match by Specialization
+        matched = self.by_specialty(suggestion) if suggestion else []
+
+        # 2. Fallback to Name Search
+        if not matched and suggestion:
+            matched = self.search_name(suggestion.replace('Dr. ', ''))
+
+        # 3. Emergency Fallback
+        if not matched:
+            matched = self.all()[:fallback_count]
+        return matched
+
+# Global instance
+doctor_directory = DoctorDirectory()
+db_manager.add_doctors_listener(doctor_directory.invalidate)
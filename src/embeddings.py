@@ -1,28 +1,243 @@
 import os
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
 from src.logger import logger
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 
+class CachedEmbeddings(Embeddings):
+    """
+    Caching wrapper with the same interface as the wrapped embeddings model.
+
+    Query vectors are kept in an in-memory LRU keyed by the exact text.
+    Document vectors are persisted in a small SQLite store keyed by
+    sha256(model name + text), so re-ingesting unchanged chunks (or
+    restarting the app) skips model inference. Only misses reach the model,
+    in one batched call.
+    """
+    def __init__(self, inner, model_name: str, cache_path: str = None, query_cache_size: int = 2048):
+        self.inner = inner
+        self.model_name = model_name
+        self.query_cache_size = query_cache_size
+        self._lock = threading.Lock()
+        self._queries = OrderedDict()
+        self._stats = {"query_hits": 0, "query_misses": 0, "doc_hits": 0, "doc_misses": 0}
+        self._conn = None
+        if cache_path:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_query(self, text: str):
+        with self._lock:
+            if text in self._queries:
+                self._queries.move_to_end(text)
+                self._stats["query_hits"] += 1
+                return list(self._queries[text])
+            self._stats["query_misses"] += 1
+
+        vector = [float(x) for x in np.asarray(self.inner.embed_query(text), dtype=np.float32)]
+        with self._lock:
+            self._queries[text] = tuple(vector)
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return vector
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if self._conn is None:
+            with self._lock:
+                self._stats["doc_misses"] += len(texts)
+            return self.inner.embed_documents(texts)
+
+        keys = [self._key(t) for t in texts]
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            # SQLite caps bound parameters per statement, so look up in slices
+            for i in range(0, len(unique), 500):
+                part = unique[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update((k, np.frombuffer(v, dtype=np.float32)) for k, v in rows)
+
+        missing = [i for i, k in enumerate(keys) if k not in found]
+        if missing:
+            # Duplicates inside one call are embedded once
+            todo = list(dict.fromkeys(keys[i] for i in missing))
+            text_for = {keys[i]: texts[i] for i in missing}
+            vectors = np.asarray(self.inner.embed_documents([text_for[k] for k in todo]), dtype=np.float32)
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(k, v.tobytes()) for k, v in zip(todo, vectors)]
+                )
+                self._conn.commit()
+            found.update(zip(todo, vectors))
+
+        with self._lock:
+            self._stats["doc_hits"] += len(texts) - len(missing)
+            self._stats["doc_misses"] += len(missing)
+        return [[float(x) for x in found[k]] for k in keys]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_queries"] = len(self._queries)
+        for kind in ("query", "doc"):
+            total = stats[f"{kind}_hits"] + stats[f"{kind}_misses"]
+            stats[f"{kind}_hit_ratio"] = round(stats[f"{kind}_hits"] / total, 3) if total else 0.0
+        return stats
+
+ONNX_MODEL_FILE = "model.int8.onnx"
+
+def export_onnx_model(model_name: str, out_dir: str):
+    """
+    One-time export: HF model -> ONNX (fp32) -> int8 dynamic quantization.
+    Needs torch, transformers, onnx and onnxruntime; the exported runtime
+    itself only needs onnxruntime and tokenizers.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logger.info(f"Exporting {model_name} to ONNX int8 in '{out_dir}'...")
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    fp32_path = os.path.join(out_dir, "model.fp32.onnx")
+    export_kwargs = dict(
+        input_names=names,
+        output_names=["last_hidden_state"],
+        dynamic_axes={n: {0: "batch", 1: "sequence"} for n in names + ["last_hidden_state"]},
+        opset_version=17,
+    )
+    with torch.no_grad():
+        try:
+            torch.onnx.export(model, tuple(sample[n] for n in names), fp32_path, dynamo=False, **export_kwargs)
+        except TypeError:
+            # Older torch without the dynamo switch
+            torch.onnx.export(model, tuple(sample[n] for n in names), fp32_path, **export_kwargs)
+
+    quantize_dynamic(fp32_path, os.path.join(out_dir, ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(out_dir)
+    os.remove(fp32_path)
+    logger.info("ONNX int8 export complete.")
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from an int8-quantized ONNX export, run on onnxruntime.
+
+    Reproduces the sentence-transformers pipeline of MiniLM-style models
+    (mean pooling over the attention mask, then L2 normalization) without
+    loading PyTorch. `threads` sets onnxruntime's intra-op thread count
+    (None lets onnxruntime decide).
+    """
+    def __init__(self, model_dir: str, threads: int = None, max_length: int = 256, batch_size: int = 32):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(os.path.join(model_dir, ONNX_MODEL_FILE), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+    def _embed(self, texts):
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            encoded = self.tokenizer.encode_batch(texts[i:i + self.batch_size])
+            mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            feeds = {"input_ids": np.array([e.ids for e in encoded], dtype=np.int64), "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encoded], dtype=np.int64)
+            hidden = self.session.run(None, feeds)[0]
+
+            weights = mask[..., None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts))
+
+    def embed_query(self, text: str):
+        return self._embed([text])[0]
+
 class MedicalEmbeddingManager:
     """
     Manages the initialization of the HuggingFace embedding model 
     used for clinical document vectorization.
+
+    `runtime` (or EMBEDDING_RUNTIME) picks 'torch' (sentence-transformers,
+    default) or 'onnx' (int8-quantized export under ONNX_MODEL_DIR, created on
+    first use; ONNX_THREADS sets the thread count).
     """
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    RUNTIMES = ("torch", "onnx")
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", use_cache: bool = True,
+                 runtime: str = None):
         self.model_name = model_name
+        self.use_cache = use_cache
+        self.runtime = (runtime or os.getenv("EMBEDDING_RUNTIME", "torch")).lower()
         self.embeddings = None
+        if self.runtime not in self.RUNTIMES:
+            raise ValueError(f"Unknown EMBEDDING_RUNTIME '{self.runtime}'. Use one of: {', '.join(self.RUNTIMES)}")
+
+    def _load_model(self):
+        if self.runtime == "onnx":
+            model_dir = os.getenv("ONNX_MODEL_DIR",
+                                  os.path.join("models", self.model_name.split("/")[-1] + "-onnx-int8"))
+            if not os.path.exists(os.path.join(model_dir, ONNX_MODEL_FILE)):
+                export_onnx_model(self.model_name, model_dir)
+            return OnnxEmbeddings(model_dir, threads=int(os.getenv("ONNX_THREADS", "0")) or None)
+        return HuggingFaceEmbeddings(model_name=self.model_name)
 
     def get_embeddings(self):
         """
         Initializes and returns the embedding model instance.
+
+        Unless disabled (use_cache=False or EMBEDDING_CACHE=0) the model is
+        wrapped in CachedEmbeddings; the document store lives at
+        EMBEDDING_CACHE_PATH (default data/.embedding_cache.db).
         """
         try:
-            logger.info(f"Initializing Embedding Engine: {self.model_name}")
+            logger.info(f"Initializing Embedding Engine: {self.model_name} ({self.runtime})")
             
             # Loading the model
-            self.embeddings = HuggingFaceEmbeddings(model_name=self.model_name)
+            self.embeddings = self._load_model()
+
+            if self.use_cache and os.getenv("EMBEDDING_CACHE", "1") != "0":
+                # Quantized vectors differ slightly, so each runtime gets its own cache keys
+                cache_key = self.model_name if self.runtime == "torch" else f"{self.model_name}@onnx-int8"
+                self.embeddings = CachedEmbeddings(
+                    self.embeddings, cache_key,
+                    cache_path=os.getenv("EMBEDDING_CACHE_PATH", os.path.join("data", ".embedding_cache.db")),
+                    query_cache_size=int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", "2048"))
+                )
             
             logger.info("Embedding model loaded successfully.")
-            print(f"✅ Embedding Model '{self.model_name}' loaded successfully.")
+            print(f"✅ Embedding Model '{self.model_name}' ({self.runtime}) loaded successfully.")
             return self.embeddings
             
         except Exception as e:
@@ -31,4 +246,4 @@ class MedicalEmbeddingManager:
 
 if __name__ == "__main__":
     manager = MedicalEmbeddingManager()
-    manager.get_embeddings()
\ No newline at end of file
+    manager.get_embeddings()
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import time
+from src.loader import MedicalLoader
+from src.processor import MedicalDocumentProcessor
+from src.lexical_index import BM25Index
+from src.logger import logger
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_prefix(rel_path, file_hash):
+    """Chunk id prefix for one file: identical PDFs at different paths never share ids."""
+    return hashlib.sha256(f"{rel_path}\0{file_hash}".encode("utf-8")).hexdigest()[:16]
+
+class IncrementalIngestor:
+    """
+    Incremental PDF -> vector index pipeline.
+
+    A JSON manifest records, per PDF under `data_path`, its SHA-256 and the ids
+    of the chunks upserted for it. A run only loads, splits, embeds and
+    upserts new or changed files, and deletes the vectors of changed or
+    removed ones. Chunk ids are derived from the file's path and hash, so re-running
+    after a crash is idempotent. The BM25 corpus and the manifest are saved
+    together after each batch that completes a file, not once per file.
+
+    PDFs are parsed on a process pool and their pages streamed through the
+    splitter; chunks are embedded in batches of `batch_size`
+    (EMBED_BATCH_SIZE), so memory does not grow with the corpus. The BM25
+    keyword corpus used by hybrid retrieval is kept in step with the vectors.
+    """
+    def __init__(self, vector_manager, data_path: str = "data/", manifest_path: str = None,
+                 batch_size: int = None, lexical_index: BM25Index = None):
+        self.vector_manager = vector_manager
+        self.lexical_index = lexical_index if lexical_index is not None else BM25Index()
+        self.batch_size = batch_size or int(os.getenv("EMBED_BATCH_SIZE", "64"))
+        self.data_path = data_path
+        self.manifest_path = manifest_path or os.getenv(
+            "INGEST_MANIFEST", os.path.join(data_path, ".ingest_manifest.json"))
+        self.loader = MedicalLoader(data_path)
+        self.processor = MedicalDocumentProcessor(data_path)
+
+    # --- Manifest ---
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    # --- Pipeline ---
+
+    def scan(self):
+        """Returns {relative path: absolute path} for every PDF under data_path."""
+        found = {}
+        for root, _, files in os.walk(self.data_path):
+            for name in files:
+                if name.lower().endswith(".pdf"):
+                    full = os.path.join(root, name)
+                    found[os.path.relpath(full, self.data_path)] = full
+        return found
+
+    def _checkpoint(self, manifest):
+        """Persists progress: keyword corpus first, so the manifest never lists chunks it lacks."""
+        self.lexical_index.save()
+        self.save_manifest(manifest)
+
+    def _finish_file(self, manifest, report, rel_path, file_hash, ids):
+        """Records a fully upserted file and drops its superseded vectors (saved by the next checkpoint)."""
+        entry = manifest.get(rel_path)
+        if entry:
+            # Old vectors go only after the new ones are in, so search never sees a gap
+            new_ids = set(ids)
+            stale = [i for i in entry["chunk_ids"] if i not in new_ids]
+            self.vector_manager.delete(stale)
+            self.lexical_index.delete(stale)
+            report["chunks_deleted"] += len(stale)
+            report["updated"].append(rel_path)
+        else:
+            report["added"].append(rel_path)
+        manifest[rel_path] = {"sha256": file_hash, "chunk_ids": ids,
+                              "ingested_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+    def run(self):
+        """Brings the vector index in line with data_path and returns a change report."""
+        start = time.perf_counter()
+        manifest = self.load_manifest()
+        on_disk = self.scan()
+        report = {"added": [], "updated": [], "removed": [], "failed": [], "unchanged": 0,
+                  "pages": 0, "chunks_upserted": 0, "chunks_deleted": 0}
+
+        # Older manifests keyed chunks by content hash alone, so identical files
+        # shared ids; those files are re-ingested under per-path ids below
+        owners = {}
+        for rel_path, entry in manifest.items():
+            for chunk_id in entry["chunk_ids"]:
+                owners[chunk_id] = owners.get(chunk_id, 0) + 1
+        shared = {chunk_id for chunk_id, count in owners.items() if count > 1}
+
+        # Files that disappeared: drop their vectors
+        for rel_path in sorted(set(manifest) - set(on_disk)):
+            old_ids = [i for i in manifest[rel_path]["chunk_ids"] if i not in shared]
+            self.vector_manager.delete(old_ids)
+            self.lexical_index.delete(old_ids)
+            report["chunks_deleted"] += len(old_ids)
+            report["removed"].append(rel_path)
+            del manifest[rel_path]
+        if report["removed"]:
+            self._checkpoint(manifest)
+
+        pending = {}    # full path -> (rel path, hash)
+        for rel_path, full_path in sorted(on_disk.items()):
+            file_hash = file_sha256(full_path)
+            entry = manifest.get(rel_path)
+            if entry and entry["sha256"] == file_hash and shared.isdisjoint(entry["chunk_ids"]):
+                report["unchanged"] += 1
+            else:
+                pending[full_path] = (rel_path, file_hash)
+
+        # Pages stream in file order from the parser pool; chunks are embedded
+        # and upserted in fixed-size batches. A file is recorded in the
+        # manifest only once all of its chunks have been flushed.
+        failed = set()
+        chunk_ids = {}          # full path -> ids assigned so far
+        batch, batch_ids = [], []
+        done = []               # files fully parsed, waiting for their last batch
+
+        def on_error(full_path, exc):
+            logger.error(f"Ingestion failed for {full_path}: {exc}")
+            failed.add(full_path)
+            # A file that fails partway must not leave its first pages searchable:
+            # drop its chunks still in the batch and delete the ones already flushed
+            partial = set(chunk_ids.get(full_path, ()))
+            if not partial:
+                return
+            queued = set(batch_ids) & partial
+            kept = [(c, i) for c, i in zip(batch, batch_ids) if i not in partial]
+            batch[:] = [c for c, _ in kept]
+            batch_ids[:] = [i for _, i in kept]
+            flushed = [i for i in chunk_ids[full_path] if i not in queued]
+            if flushed:
+                self.vector_manager.delete(flushed)
+                self.lexical_index.delete(flushed)
+                report["chunks_deleted"] += len(flushed)
+
+        def flush():
+            if batch:
+                self.vector_manager.add_documents(list(batch), ids=list(batch_ids))
+                self.lexical_index.add(batch_ids, [c.page_content for c in batch], [c.metadata for c in batch])
+                report["chunks_upserted"] += len(batch)
+                batch.clear()
+                batch_ids.clear()
+            finished = bool(done)
+            while done:
+                full_path = done.pop(0)
+                if full_path not in failed:
+                    rel_path, file_hash = pending[full_path]
+                    self._finish_file(manifest, report, rel_path, file_hash, chunk_ids[full_path])
+            if finished:
+                self._checkpoint(manifest)
+
+        current = None
+        pages = self.loader.iter_pages(list(pending), on_error=on_error)
+        for page in pages:
+            full_path = page.metadata["source"]
+            if full_path != current:
+                if current is not None:
+                    done.append(current)
+                current = full_path
+                chunk_ids[full_path] = []
+            if full_path in failed:
+                continue
+            report["pages"] += 1
+            rel_path, file_hash = pending[full_path]
+            prefix = chunk_prefix(rel_path, file_hash)
+            for chunk in self.processor.split_documents([page]):
+                chunk.metadata["content_hash"] = file_hash
+                chunk_id = f"{prefix}-{len(chunk_ids[full_path])}"
+                chunk_ids[full_path].append(chunk_id)
+                batch.append(chunk)
+                batch_ids.append(chunk_id)
+                if len(batch) >= self.batch_size:
+                    flush()
+        if current is not None:
+            done.append(current)
+        flush()
+
+        # Files that produced no pages at all (empty PDFs) still get a manifest entry
+        for full_path, (rel_path, file_hash) in pending.items():
+            if full_path not in chunk_ids and full_path not in failed:
+                self._finish_file(manifest, report, rel_path, file_hash, [])
+        self._checkpoint(manifest)
+        report["failed"] = sorted(pending[p][0] for p in failed)
+
+        report["seconds"] = round(time.perf_counter() - start, 2)
+        logger.info(f"Incremental ingestion: {len(report['added'])} added, "
+                    f"{len(report['updated'])} updated, {len(report['removed'])} removed, "
+                    f"{report['unchanged']} unchanged, {len(report['failed'])} failed; "
+                    f"{report['pages']} pages in {report['seconds']}s.")
+        return report
+
+if __name__ == "__main__":
+    from src.embeddings import MedicalEmbeddingManager
+    from src.vector_store import MedicalVectorManager
+
+    embeddings = MedicalEmbeddingManager().get_embeddings()
+    vector_manager = MedicalVectorManager(embedding_model=embeddings)
+    report = IncrementalIngestor(vector_manager).run()
+    print(f"✅ Added: {len(report['added'])} | Updated: {len(report['updated'])} | "
+          f"Removed: {len(report['removed'])} | Unchanged: {report['unchanged']} | "
+          f"Chunks +{report['chunks_upserted']} / -{report['chunks_deleted']} in {report['seconds']}s")
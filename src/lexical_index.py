@@ -0,0 +1,134 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from langchain_core.documents import Document
+from src.logger import logger
+
+# Keeps drug names, doses and lab codes whole: 'hba1c', 'b12', 'covid-19', '0.5mg'
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(text.casefold())
+
+class BM25Index:
+    """
+    In-process BM25 (Okapi) inverted index over the ingested chunks.
+
+    The corpus (chunk id -> text + metadata) is persisted as JSON at `path`
+    and maintained by the ingestion pipeline next to the vector index, under
+    the same chunk ids. Postings are rebuilt lazily after changes, and the
+    file is reloaded when another process (an ingestion run) rewrites it.
+    """
+    def __init__(self, path: str = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path or os.getenv("BM25_INDEX_PATH", os.path.join("data", ".bm25_corpus.json"))
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._corpus = {}           # id -> (text, metadata)
+        self._postings = None       # term -> [(doc index, term frequency)]
+        self._doc_ids = []
+        self._doc_lens = []
+        self._avg_len = 0.0
+        self._mtime = None
+        self._dirty = False
+        self._load()
+
+    def __len__(self):
+        return len(self._corpus)
+
+    # --- Persistence ---
+
+    def _load(self):
+        try:
+            self._mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self._corpus = {cid: (entry["text"], entry["metadata"]) for cid, entry in data.items()}
+        self._postings = None
+        self._dirty = False
+        logger.info(f"BM25 corpus loaded: {len(self._corpus)} chunks from '{self.path}'.")
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self._load()
+
+    def save(self):
+        """Writes the corpus if it changed since the last load or save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            data = {cid: {"text": text, "metadata": meta} for cid, (text, meta) in self._corpus.items()}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(self.path + ".tmp", self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    # --- Writes ---
+
+    def add(self, ids, texts, metadatas):
+        with self._lock:
+            for cid, text, meta in zip(ids, texts, metadatas):
+                self._corpus[cid] = (text, dict(meta))
+            self._postings = None
+            self._dirty = True
+
+    def delete(self, ids):
+        with self._lock:
+            for cid in ids:
+                if self._corpus.pop(cid, None) is not None:
+                    self._dirty = True
+            self._postings = None
+
+    # --- Search ---
+
+    def _build(self):
+        postings = defaultdict(list)
+        doc_ids, doc_lens = [], []
+        for idx, (cid, (text, _)) in enumerate(self._corpus.items()):
+            terms = Counter(tokenize(text))
+            for term, tf in terms.items():
+                postings[term].append((idx, tf))
+            doc_ids.append(cid)
+            doc_lens.append(sum(terms.values()))
+        self._postings, self._doc_ids, self._doc_lens = postings, doc_ids, doc_lens
+        self._avg_len = (sum(doc_lens) / len(doc_lens)) if doc_lens else 0.0
+
+    def search(self, query: str, k: int = 10):
+        """Returns up to k (Document, bm25 score) pairs, best first."""
+        with self._lock:
+            self._reload_if_changed()
+            if self._postings is None:
+                self._build()
+            n = len(self._doc_ids)
+            if not n:
+                return []
+
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                plist = self._postings.get(term)
+                if not plist:
+                    continue
+                idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+                for idx, tf in plist:
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lens[idx] / self._avg_len)
+                    scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            top = heapq.nlargest(k, scores.items(), key=lambda kv: kv[1])
+            results = []
+            for idx, score in top:
+                cid = self._doc_ids[idx]
+                text, meta = self._corpus[cid]
+                results.append((Document(page_content=text, metadata=dict(meta), id=cid), score))
+            return results
@@ -0,0 +1,394 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from src.context_packer import estimate_tokens
+from src.logger import get_logger
+from src.metrics import metrics
+
+logger = get_logger("llm_gateway")
+
+# HTTP statuses worth another attempt (throttling, overload, upstream hiccups)
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+class LLMUnavailableError(RuntimeError):
+    """No model could answer within the deadline (circuit open, rate limited or retries exhausted)."""
+
+def is_retryable(error) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Client libraries wrap transport errors in their own classes (APITimeoutError, APIConnectionError, ...)
+    name = type(error).__name__
+    return any(word in name for word in ("Timeout", "Connection", "RateLimit", "Overloaded"))
+
+def retry_after(error):
+    """Seconds from a Retry-After header on the error's response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens/second up to `capacity`.
+    `reserve(cost, max_wait)` books the tokens and returns how long the caller
+    must wait before using them, or None (nothing booked) if that wait would
+    exceed `max_wait`. A rate of 0 disables the bucket.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, cost: float = 1.0, max_wait: float = float("inf")):
+        if self.rate <= 0:
+            return 0.0
+        cost = min(cost, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (cost - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            # Going negative books the tokens for a caller that is now waiting
+            self._tokens -= cost
+            return wait
+
+    def refund(self, cost: float = 1.0):
+        """Gives back tokens booked by a call that was then refused elsewhere."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(cost, self.capacity))
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_seconds`; then lets one probe through (half-open). A successful
+    probe closes it, a failed one opens it again.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def release_probe(self):
+        """The probe was abandoned (client gone, cancelled or a caller error): neither success nor failure."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    logger.warning(f"LLM circuit opened after {self._failures} consecutive failures.")
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+class _Route:
+    """One model behind the gateway with its own quota bucket and breaker."""
+    def __init__(self, name, llm, requests_per_minute, tokens_per_minute, burst, breaker):
+        self.name = name
+        self.llm = llm
+        self.requests = TokenBucket(requests_per_minute / 60.0, burst)
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute / 6.0 if tokens_per_minute else 1)
+        self.breaker = breaker
+
+class LLMGateway:
+    """
+    Wraps a chat model (invoke / ainvoke / stream) so a slow or throttling
+    provider cannot stall the app:
+
+      * token buckets per model, matched to the provider quota (requests and
+        prompt tokens per minute); a call that would wait longer than
+        `max_wait` is not queued at all
+      * at most `max_concurrency` calls in flight across threads and coroutines
+      * retries with full-jitter backoff (or Retry-After) for throttling,
+        timeouts and 5xx, never past the per-call `deadline`: each attempt
+        gets at most `attempt_timeout` or the time left (passed to the model
+        as `timeout=`), and none starts with less than `min_attempt` left
+      * a circuit breaker per model that fails fast while the provider is down
+      * an optional smaller fallback model, tried when the primary cannot answer
+
+    Raises LLMUnavailableError when no model answered.
+    """
+    def __init__(self, llm, fallback_llm=None, model_name="primary", fallback_name="fallback",
+                 requests_per_minute=None, tokens_per_minute=None, burst=None, max_concurrency=None,
+                 max_retries=None, deadline=None, max_wait=None, attempt_timeout=None,
+                 min_attempt=None, token_counter=None):
+        rpm = float(os.getenv("LLM_RATE_PER_MINUTE", "30") if requests_per_minute is None else requests_per_minute)
+        tpm = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0") if tokens_per_minute is None else tokens_per_minute)
+        burst = float(burst or os.getenv("LLM_BURST", "5"))
+        breaker = lambda: CircuitBreaker(int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                                         float(os.getenv("LLM_BREAKER_RESET", "30")))
+
+        self.routes = [_Route(model_name, llm, rpm, tpm, burst, breaker())]
+        if fallback_llm is not None:
+            self.routes.append(_Route(fallback_name, fallback_llm, rpm, tpm, burst, breaker()))
+        self.max_concurrency = int(max_concurrency or os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "2") if max_retries is None else max_retries)
+        self.deadline = float(deadline or os.getenv("LLM_DEADLINE", "20"))
+        self.max_wait = float(max_wait or os.getenv("LLM_MAX_WAIT", "5"))
+        self.attempt_timeout = float(attempt_timeout or os.getenv("LLM_ATTEMPT_TIMEOUT", "10"))
+        self.min_attempt = float(os.getenv("LLM_MIN_ATTEMPT", "0.5") if min_attempt is None else min_attempt)
+        self.base_delay, self.max_delay = 0.5, 4.0
+        self.count_tokens = token_counter or estimate_tokens
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    # --- Admission ---
+
+    def _cost(self, messages):
+        return self.count_tokens("".join(getattr(m, "content", str(m)) for m in messages))
+
+    def _admit(self, route, cost, remaining):
+        """
+        (seconds to wait for the route's quota, True if this call is the
+        half-open probe), or None when the call should go elsewhere. Quota
+        booked for a call that is then refused is refunded.
+        """
+        state = route.breaker.state
+        if state == "open":
+            metrics.inc("llm_rejected_total", model=route.name, reason="circuit_open")
+            return None
+        if remaining < self.min_attempt:
+            metrics.inc("llm_rejected_total", model=route.name, reason="deadline")
+            return None
+        # Whatever the wait, the first attempt still gets `min_attempt`
+        max_wait = min(self.max_wait, remaining - self.min_attempt)
+        wait = route.requests.reserve(1, max_wait)
+        if wait is not None and route.tokens.rate > 0:
+            token_wait = route.tokens.reserve(cost, max_wait)
+            if token_wait is None:
+                route.requests.refund(1)
+            wait = None if token_wait is None else max(wait, token_wait)
+        if wait is None:
+            metrics.inc("llm_rejected_total", model=route.name, reason="rate_limited")
+            return None
+        # Half-open lets a single probe through
+        if not route.breaker.allow():
+            route.requests.refund(1)
+            route.tokens.refund(cost)
+            metrics.inc("llm_rejected_total", model=route.name, reason="circuit_open")
+            return None
+        return wait, state == "half_open"
+
+    def _attempt_timeout(self, deadline):
+        """Seconds the next attempt may take, or None when too little is left before the deadline."""
+        remaining = deadline - time.monotonic()
+        if remaining < self.min_attempt:
+            return None
+        return min(self.attempt_timeout, remaining)
+
+    def _backoff(self, attempt, error):
+        hinted = retry_after(error)
+        if hinted is not None:
+            return hinted
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _acquire_slot(self, timeout):
+        if not self._slots.acquire(timeout=max(0.0, timeout)):
+            metrics.inc("llm_rejected_total", model="all", reason="concurrency")
+            raise LLMUnavailableError("LLM concurrency limit reached.")
+
+    async def _aacquire_slot(self, timeout):
+        # The semaphore is shared with threaded callers, so coroutines poll it
+        # instead of parking a thread of the shared executor on it
+        give_up, pause = time.monotonic() + max(0.0, timeout), 0.005
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= give_up:
+                metrics.inc("llm_rejected_total", model="all", reason="concurrency")
+                raise LLMUnavailableError("LLM concurrency limit reached.")
+            await asyncio.sleep(pause)
+            pause = min(pause * 2, 0.05)
+
+    def _on_error(self, route, attempt, error, deadline, probe):
+        """Records a failed attempt; returns the backoff before the next one, or None to give up on this route."""
+        retryable = is_retryable(error)
+        metrics.inc("llm_attempts_total", model=route.name, outcome="retryable" if retryable else "error")
+        # Only provider-side failures count toward the circuit; a bad request says nothing about its health
+        if retryable:
+            route.breaker.record_failure()
+        elif probe:
+            route.breaker.release_probe()
+        logger.warning(f"LLM attempt {attempt + 1} on '{route.name}' failed: {type(error).__name__}: {error}")
+        if not retryable or attempt >= self.max_retries or route.breaker.state != "closed":
+            return None
+        delay = self._backoff(attempt, error)
+        if time.monotonic() + delay + self.min_attempt > deadline:
+            return None
+        return delay
+
+    @staticmethod
+    def _unavailable(last_error):
+        reason = f"{type(last_error).__name__}: {last_error}" if last_error else "circuit open or rate limited"
+        return LLMUnavailableError(f"No LLM available ({reason})")
+
+    # --- Chat model interface ---
+    # A probe abandoned by GeneratorExit / CancelledError (client gone, request
+    # cancelled) is released as neutral, so the breaker can probe again
+
+    def invoke(self, messages, **kwargs):
+        deadline = time.monotonic() + self.deadline
+        cost, last_error = self._cost(messages), None
+        self._acquire_slot(min(self.max_wait, self.deadline))
+        try:
+            for route in self.routes:
+                admitted = self._admit(route, cost, deadline - time.monotonic())
+                if admitted is None:
+                    continue
+                wait, probe = admitted
+                try:
+                    time.sleep(wait)
+                    for attempt in range(self.max_retries + 1):
+                        timeout = self._attempt_timeout(deadline)
+                        if timeout is None:
+                            if probe and attempt == 0:
+                                route.breaker.release_probe()
+                            break
+                        try:
+                            # The sync client cannot be cancelled, so the cap goes into the request
+                            result = route.llm.invoke(messages, **{**kwargs, "timeout": timeout})
+                        except Exception as e:
+                            last_error = e
+                            delay = self._on_error(route, attempt, e, deadline, probe)
+                            if delay is None:
+                                break
+                            time.sleep(delay)
+                            continue
+                        route.breaker.record_success()
+                        metrics.inc("llm_attempts_total", model=route.name, outcome="ok")
+                        return result
+                except BaseException:
+                    if probe:
+                        route.breaker.release_probe()
+                    raise
+        finally:
+            self._slots.release()
+        raise self._unavailable(last_error)
+
+    async def ainvoke(self, messages, **kwargs):
+        deadline = time.monotonic() + self.deadline
+        cost, last_error = self._cost(messages), None
+        await self._aacquire_slot(min(self.max_wait, self.deadline))
+        try:
+            for route in self.routes:
+                admitted = self._admit(route, cost, deadline - time.monotonic())
+                if admitted is None:
+                    continue
+                wait, probe = admitted
+                try:
+                    await asyncio.sleep(wait)
+                    for attempt in range(self.max_retries + 1):
+                        timeout = self._attempt_timeout(deadline)
+                        if timeout is None:
+                            if probe and attempt == 0:
+                                route.breaker.release_probe()
+                            break
+                        try:
+                            result = await asyncio.wait_for(route.llm.ainvoke(messages, **kwargs), timeout)
+                        except Exception as e:
+                            last_error = e
+                            delay = self._on_error(route, attempt, e, deadline, probe)
+                            if delay is None:
+                                break
+                            await asyncio.sleep(delay)
+                            continue
+                        route.breaker.record_success()
+                        metrics.inc("llm_attempts_total", model=route.name, outcome="ok")
+                        return result
+                except BaseException:
+                    if probe:
+                        route.breaker.release_probe()
+                    raise
+        finally:
+            self._slots.release()
+        raise self._unavailable(last_error)
+
+    def stream(self, messages, **kwargs):
+        """Retries and falls back only until the first chunk arrives; a stream that breaks later raises."""
+        deadline = time.monotonic() + self.deadline
+        cost, last_error = self._cost(messages), None
+        self._acquire_slot(min(self.max_wait, self.deadline))
+        try:
+            for route in self.routes:
+                admitted = self._admit(route, cost, deadline - time.monotonic())
+                if admitted is None:
+                    continue
+                wait, probe = admitted
+                try:
+                    time.sleep(wait)
+                    for attempt in range(self.max_retries + 1):
+                        timeout = self._attempt_timeout(deadline)
+                        if timeout is None:
+                            if probe and attempt == 0:
+                                route.breaker.release_probe()
+                            break
+                        started = False
+                        try:
+                            for chunk in route.llm.stream(messages, **{**kwargs, "timeout": timeout}):
+                                started = True
+                                yield chunk
+                        except Exception as e:
+                            last_error = e
+                            if started:
+                                if is_retryable(e):
+                                    route.breaker.record_failure()
+                                metrics.inc("llm_attempts_total", model=route.name, outcome="error")
+                                raise
+                            delay = self._on_error(route, attempt, e, deadline, probe)
+                            if delay is None:
+                                break
+                            time.sleep(delay)
+                            continue
+                        route.breaker.record_success()
+                        metrics.inc("llm_attempts_total", model=route.name, outcome="ok")
+                        return
+                except BaseException:
+                    if probe:
+                        route.breaker.release_probe()
+                    raise
+        finally:
+            self._slots.release()
+        raise self._unavailable(last_error)
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "models": {route.name: route.breaker.state for route in self.routes},
+        }
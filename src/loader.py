@@ -1,8 +1,16 @@
 import os
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List
 from langchain_community.document_loaders import DirectoryLoader, PyMuPDFLoader
 from langchain_core.documents import Document
 
+def _parse_pages(path: str, start: int, stop: int):
+    """Process-pool worker: extracts the text of pages [start, stop) of one PDF."""
+    import pymupdf
+    with pymupdf.open(path) as pdf:
+        return [(i, pdf[i].get_text()) for i in range(start, stop)]
+
 class MedicalLoader:
     """
     Handles loading of medical PDF documents for the HMS RAG Pipeline.
@@ -44,6 +52,61 @@ class MedicalLoader:
             print(f"❌ Critical Error during document loading: {str(e)}")
             return []
 
+    def iter_pages(self, paths, workers: int = None, pages_per_task: int = 32,
+                   on_error=None) -> Iterator[Document]:
+        """
+        Yields one Document per page of `paths`, in order, parsing page ranges
+        across a PyMuPDF process pool. At most two ranges per worker are in
+        flight, so memory stays bounded however large the corpus is.
+        `on_error(path, exc)` is called once for a file that fails to parse;
+        its remaining pages are skipped.
+        """
+        import pymupdf
+
+        workers = workers or int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+        failed = set()
+
+        def report(path, exc):
+            failed.add(path)
+            if on_error:
+                on_error(path, exc)
+            else:
+                print(f"❌ Failed to parse {path}: {exc}")
+
+        def tasks():
+            for path in paths:
+                try:
+                    with pymupdf.open(path) as pdf:
+                        total = pdf.page_count
+                except Exception as e:
+                    report(path, e)
+                    continue
+                for start in range(0, total, pages_per_task):
+                    yield path, total, start, min(start + pages_per_task, total)
+
+        def pages(path, total, future):
+            if path in failed:
+                return
+            try:
+                parsed = future.result()
+            except Exception as e:
+                report(path, e)
+                return
+            for page_no, text in parsed:
+                yield Document(page_content=text, metadata={
+                    "source": path, "file_path": path, "file_name": os.path.basename(path),
+                    "page": page_no, "total_pages": total,
+                })
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            window = deque()
+            for path, total, start, stop in tasks():
+                window.append((path, total, pool.submit(_parse_pages, path, start, stop)))
+                if len(window) >= 2 * workers:
+                    yield from pages(*window.popleft())
+            while window:
+                yield from pages(*window.popleft())
+
 # Unit Testing (Optional: Only runs if you execute this file directly)
 if __name__ == "__main__":
     loader = MedicalLoader("data")
@@ -0,0 +1,285 @@
+import json
+import os
+import threading
+import uuid
+from typing import Iterable, List, Optional
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from src.logger import logger
+
+class LocalVectorStore(VectorStore):
+    """
+    Offline vector store backed by a memory-mapped float32 matrix.
+
+    `<path>/vectors.f32` holds one L2-normalized embedding per row and
+    `<path>/metadata.jsonl` holds a `{"dim": ...}` header followed by one
+    `{"id", "text", "metadata"}` line per row. New rows are appended to both
+    files and the matrix is remapped, so ingesting a batch costs I/O
+    proportional to the batch; the files are only rewritten (compacted) when
+    rows are deleted or an existing id is re-added. A search first remaps if
+    another process (e.g. `python -m src.ingestion`) changed the files.
+
+    Search is an exact inner-product (cosine) scan over the memmap, which for
+    a guideline corpus of a few thousand chunks is a sub-millisecond BLAS
+    call, so no approximate (IVF/HNSW) index is needed. Scores are cosine similarities:
+    higher is more relevant, as with the Pinecone index.
+    """
+    VECTORS_FILE = "vectors.f32"
+    METADATA_FILE = "metadata.jsonl"
+    LEGACY_METADATA_FILE = "metadata.json"
+
+    def __init__(self, embedding, path: str = "vector_index"):
+        self._embedding = embedding
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._rows = {}     # id -> row number
+        self._dim = 0
+        self._matrix = None
+        self._signature = None      # (mtime, size) of both files as last loaded or written
+        self._needs_repair = False
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    # --- Persistence ---
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _map(self, rows):
+        self._matrix = (np.memmap(self._file(self.VECTORS_FILE), dtype=np.float32, mode="r",
+                                  shape=(rows, self._dim)) if rows else None)
+
+    def _stat(self):
+        signature = []
+        for name in (self.VECTORS_FILE, self.METADATA_FILE):
+            try:
+                st = os.stat(self._file(name))
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _reload_if_changed(self):
+        """Picks up rows written by another process (e.g. an ingestion run)."""
+        if self._stat() == self._signature:
+            return
+        with self._lock:
+            if self._stat() != self._signature:
+                self._load()
+
+    def _load(self):
+        meta_path = self._file(self.METADATA_FILE)
+        legacy_path = self._file(self.LEGACY_METADATA_FILE)
+        # Taken before reading, so a write that lands meanwhile triggers another reload
+        signature = self._stat()
+        if not os.path.exists(meta_path):
+            if os.path.exists(legacy_path):
+                self._load_legacy(legacy_path)
+            else:
+                self._dim, self._needs_repair = 0, False
+                self._set_rows([], [], [])
+                self._map(0)
+                self._signature = signature
+                logger.info(f"Local vector index at '{self.path}' is empty.")
+            return
+
+        ids, texts, metadatas, torn = [], [], [], False
+        with open(meta_path, encoding="utf-8") as f:
+            dim = json.loads(f.readline() or '{"dim": 0}')["dim"]
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted append; everything before it is intact
+                    torn = True
+                    break
+                ids.append(record["id"])
+                texts.append(record["text"])
+                metadatas.append(record["metadata"])
+
+        vec_path = self._file(self.VECTORS_FILE)
+        size = os.path.getsize(vec_path) if os.path.exists(vec_path) else 0
+        rows = min(len(ids), size // (4 * dim)) if dim else 0
+        # Vectors are appended before their metadata, so an add in progress (or
+        # one interrupted by a crash) shows up as extra rows or a torn last
+        # line; only the complete prefix is used. Loading never writes, since
+        # another process may be mid-append: the next add repairs the files.
+        self._dim = dim
+        self._set_rows(ids[:rows], texts[:rows], metadatas[:rows])
+        self._needs_repair = torn or rows != len(ids) or size != rows * dim * 4
+        self._map(rows)
+        self._signature = signature
+        logger.info(f"Local vector index loaded: {len(self._ids)} vectors from '{self.path}'.")
+
+    def _load_legacy(self, legacy_path):
+        """Converts an index written as a single metadata.json to the append-only layout."""
+        with open(legacy_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        self._dim = meta["dim"]
+        matrix = (np.array(np.memmap(self._file(self.VECTORS_FILE), dtype=np.float32, mode="r",
+                                     shape=(len(meta["ids"]), self._dim)))
+                  if meta["ids"] else np.zeros((0, self._dim), dtype=np.float32))
+        self._rewrite(matrix, meta["ids"], meta["texts"], meta["metadatas"])
+        os.remove(legacy_path)
+        logger.info(f"Local vector index converted: {len(self._ids)} vectors from '{self.path}'.")
+
+    def _set_rows(self, ids, texts, metadatas):
+        self._ids, self._texts, self._metadatas = ids, texts, metadatas
+        self._rows = {id_: row for row, id_ in enumerate(ids)}
+
+    def _append(self, vectors, ids, texts, metadatas):
+        """Appends rows to both files and remaps the matrix. Caller holds the lock."""
+        if self._needs_repair:
+            logger.warning(f"Local vector index at '{self.path}' was not closed cleanly; "
+                           f"keeping its {len(self._ids)} complete rows.")
+            matrix = np.array(self._matrix) if self._ids else np.zeros((0, self._dim), dtype=np.float32)
+            self._rewrite(matrix, self._ids, self._texts, self._metadatas)
+        meta_path = self._file(self.METADATA_FILE)
+        new_file = not self._ids
+        if new_file:
+            self._dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self._dim:
+            raise ValueError(f"Embedding size {vectors.shape[1]} does not match the index ({self._dim}).")
+
+        # Vectors first: rows without metadata are dropped on load, never the reverse
+        with open(self._file(self.VECTORS_FILE), "wb" if new_file else "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(meta_path, "w" if new_file else "a", encoding="utf-8") as f:
+            if new_file:
+                f.write(json.dumps({"dim": self._dim}) + "\n")
+            f.writelines(json.dumps({"id": id_, "text": text, "metadata": metadata}) + "\n"
+                         for id_, text, metadata in zip(ids, texts, metadatas))
+
+        # Extended in place: readers holding the old map only index rows it already had
+        base = len(self._ids)
+        self._ids.extend(ids)
+        self._texts.extend(texts)
+        self._metadatas.extend(metadatas)
+        self._rows.update((id_, base + n) for n, id_ in enumerate(ids))
+        self._map(len(self._ids))
+        self._signature = self._stat()
+
+    def _rewrite(self, matrix, ids, texts, metadatas):
+        """Compacts: writes a new matrix + metadata pair and swaps it in. Caller holds the lock."""
+        vec_path = self._file(self.VECTORS_FILE)
+        meta_path = self._file(self.METADATA_FILE)
+        # Release the current read-only map before replacing the file under it
+        self._matrix = None
+        if len(ids):
+            self._dim = int(matrix.shape[1])
+            out = np.memmap(vec_path + ".tmp", dtype=np.float32, mode="w+", shape=matrix.shape)
+            out[:] = matrix
+            out.flush()
+            del out
+            os.replace(vec_path + ".tmp", vec_path)
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(json.dumps({"dim": self._dim}) + "\n")
+                f.writelines(json.dumps({"id": id_, "text": text, "metadata": metadata}) + "\n"
+                             for id_, text, metadata in zip(ids, texts, metadatas))
+            os.replace(meta_path + ".tmp", meta_path)
+        else:
+            for stale in (vec_path, meta_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+        # New lists, so readers keep a consistent snapshot of the old rows
+        self._set_rows(list(ids), list(texts), list(metadatas))
+        self._map(len(ids))
+        self._signature, self._needs_repair = self._stat(), False
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    # --- Writes ---
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        vectors = kwargs.get("embeddings")
+        if vectors is None:
+            vectors = self._embedding.embed_documents(texts)
+        vectors = self._normalize(vectors)
+
+        with self._lock:
+            if not any(id_ in self._rows for id_ in ids):
+                self._append(vectors, ids, texts, metadatas)
+                return ids
+            # Upsert: rows whose id is being re-added are replaced, which compacts the files
+            replaced = set(ids)
+            keep = [i for i, existing in enumerate(self._ids) if existing not in replaced]
+            old = np.asarray(self._matrix[keep]) if keep else None
+            matrix = vectors if old is None else np.vstack([old, vectors])
+            self._rewrite(
+                matrix,
+                [self._ids[i] for i in keep] + ids,
+                [self._texts[i] for i in keep] + texts,
+                [self._metadatas[i] for i in keep] + metadatas,
+            )
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs) -> Optional[bool]:
+        if not ids:
+            return False
+        removed = set(ids)
+        with self._lock:
+            if not any(id_ in self._rows for id_ in removed):
+                return False
+            keep = [i for i, existing in enumerate(self._ids) if existing not in removed]
+            matrix = np.asarray(self._matrix[keep]) if keep else np.zeros((0, self._dim), dtype=np.float32)
+            self._rewrite(matrix, [self._ids[i] for i in keep], [self._texts[i] for i in keep],
+                          [self._metadatas[i] for i in keep])
+        return True
+
+    # --- Reads ---
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 4, **kwargs):
+        self._reload_if_changed()
+        with self._lock:
+            matrix, ids, texts, metadatas = self._matrix, self._ids, self._texts, self._metadatas
+        if matrix is None:
+            return []
+        query = self._normalize(embedding)
+        scores = matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(Document(page_content=texts[i], metadata=dict(metadatas[i]), id=ids[i]), float(scores[i]))
+                for i in top]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k)
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] mapped to [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def __len__(self):
+        return len(self._ids)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, path="vector_index", **kwargs):
+        store = cls(embedding, path=path)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -1,16 +1,157 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
 import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # Logs folder banayein agar nahi hai
 log_dir = "logs"
 if not os.path.exists(log_dir):
     os.makedirs(log_dir)
 
-logging.basicConfig(
-    filename=os.path.join(log_dir, "medai.log"),
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+ROOT_LOGGER = "MedAI_System"
 
-logger = logging.getLogger("MedAI_System")
\ No newline at end of file
+# Set per request (Flask before_request / ASGI handlers); copied onto every record
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+def set_request_id(request_id: str):
+    return request_id_var.set(request_id)
+
+def _parse_overrides(spec: str):
+    """'MedAI_System.retriever=WARNING,httpx=0.1' -> {'MedAI_System.retriever': 'WARNING', 'httpx': '0.1'}"""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {name.strip(): value.strip() for name, value in pairs}
+
+class ContextFilter(logging.Filter):
+    """
+    Runs on the request thread before a record is queued: stamps the request
+    ID and drops a configured fraction of sub-WARNING records for sampled
+    loggers (warnings and errors are never sampled).
+    """
+    def __init__(self, sample_rates=None):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+        self._resolved = {}
+
+    def _rate(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, probe = 1.0, name
+            while probe:
+                if probe in self.sample_rates:
+                    rate = self.sample_rates[probe]
+                    break
+                probe = probe.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        if record.levelno < logging.WARNING and self.sample_rates:
+            rate = self._rate(record.name)
+            if rate < 1.0 and random.random() >= rate:
+                return False
+        return True
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller: when the queue is full the record is dropped and counted."""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Merge args and render the traceback here (the record crosses threads),
+        # but keep them apart so the JSON line has separate "msg" and "exc"
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+def configure_logging():
+    """
+    Routes every log record through a bounded in-memory queue to a background
+    listener that writes size-rotated files, so logging never waits on disk.
+
+    LOG_LEVEL         root level (default INFO)
+    LOG_FORMAT        'json' (default) or 'text'
+    LOG_FILE          default logs/medai.log; LOG_MAX_BYTES / LOG_BACKUPS rotate it
+    LOG_LEVELS        per-logger levels, e.g. 'MedAI_System.retriever=WARNING,httpx=WARNING'
+    LOG_SAMPLE        per-logger sampling of sub-WARNING records, e.g. 'MedAI_System.retriever=0.1'
+    LOG_QUEUE_SIZE    records buffered before new ones are dropped (default 10000)
+    """
+    root = logging.getLogger()
+    if getattr(root, "_hms_configured", False):
+        return root._hms_listener
+
+    file_handler = RotatingFileHandler(
+        os.getenv("LOG_FILE", os.path.join(log_dir, "medai.log")),
+        maxBytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backupCount=int(os.getenv("LOG_BACKUPS", "5")),
+        encoding="utf-8",
+    )
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        ))
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+    queue_handler = DroppingQueueHandler(log_queue)
+    sample_rates = {name: float(rate) for name, rate in _parse_overrides(os.getenv("LOG_SAMPLE", "")).items()}
+    queue_handler.addFilter(ContextFilter(sample_rates))
+
+    root.handlers = [queue_handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, level in _parse_overrides(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    # Flush whatever is still queued on interpreter exit
+    atexit.register(listener.stop)
+    root._hms_configured = True
+    root._hms_listener = listener
+    return listener
+
+def dropped_records() -> int:
+    """Records discarded because the log queue was full (exported on /metrics)."""
+    return sum(getattr(h, "dropped", 0) for h in logging.getLogger().handlers)
+
+def get_logger(name: str = None):
+    """The shared HMS logger, or a child of it (e.g. 'MedAI_System.retriever') for per-module overrides."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}" if name else ROOT_LOGGER)
+
+configure_logging()
+logger = get_logger()
@@ -0,0 +1,180 @@
+import bisect
+import threading
+import time
+
+# Upper bounds in seconds; wide enough for SQLite reads (sub-ms) and Groq calls (seconds)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+class Histogram:
+    """Fixed-bucket latency histogram; quantiles are interpolated from the buckets."""
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)     # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+                if i == len(LATENCY_BUCKETS):
+                    return lower    # beyond the last bound
+                return lower + (LATENCY_BUCKETS[i] - lower) * (rank - seen) / n
+            seen += n
+        return LATENCY_BUCKETS[-1]
+
+class _StageTimer:
+    """Context manager behind MetricsRegistry.timer (a class: cheaper than @contextmanager)."""
+    __slots__ = ("registry", "stage", "start")
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe("stage_seconds", time.perf_counter() - self.start, stage=self.stage)
+        if exc_type is not None:
+            self.registry.error(self.stage)
+        return False
+
+class MetricsRegistry:
+    """
+    In-process metrics for the hot paths, rendered as Prometheus text.
+
+    `timer(stage)` records the latency of a stage (embedding, vector search,
+    LLM call, SQLite read/write, ...) into a histogram and counts exceptions
+    that escape it; `error(stage)` counts failures that are handled inside
+    a stage. Recording is a bisect and a few increments under one lock.
+    Collectors registered with `add_collector` contribute gauges (cache hit
+    ratios, coalescing rate, ...) at scrape time only.
+    """
+    def __init__(self, prefix="hms"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}   # (family, labels) -> Histogram
+        self._counters = {}     # (family, labels) -> int
+        self._collectors = []
+        self._help = {}
+
+    # --- Recording ---
+
+    def observe(self, family, seconds, **labels):
+        key = (family, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(seconds)
+
+    def inc(self, family, amount=1, **labels):
+        key = (family, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def error(self, stage):
+        self.inc("stage_errors_total", stage=stage)
+
+    def timer(self, stage):
+        """`with metrics.timer("llm_generate"): ...` records latency and counts escaping exceptions."""
+        return _StageTimer(self, stage)
+
+    def add_collector(self, fn):
+        """`fn()` returns an iterable of (name, labels dict, value); called on every scrape."""
+        self._collectors.append(fn)
+
+    def describe(self, family, text):
+        self._help[family] = text
+
+    # --- Exposition ---
+
+    def snapshot(self, family="stage_seconds"):
+        """{labels: {"count", "p50", "p95", "p99"}} for one histogram family (for the benchmark/report)."""
+        with self._lock:
+            return {
+                labels: {"count": h.count, **{f"p{int(q * 100)}": h.quantile(q) for q in QUANTILES}}
+                for (fam, labels), h in self._histograms.items() if fam == family
+            }
+
+    def render(self) -> str:
+        lines, p = [], self.prefix
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            hist_copies = [(k, list(h.counts), h.sum, h.count, [h.quantile(q) for q in QUANTILES])
+                           for k, h in histograms]
+
+        typed = set()
+        def header(name, kind, family):
+            if name not in typed:
+                typed.add(name)
+                if family in self._help:
+                    lines.append(f"# HELP {name} {self._help[family]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (family, labels), counts, total, count, quantiles in hist_copies:
+            name = f"{p}_{family}"
+            header(name, "histogram", family)
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        # Precomputed percentiles, so dashboards need no histogram_quantile()
+        for (family, labels), _, _, _, quantiles in hist_copies:
+            name = f"{p}_{family.replace('_seconds', '')}_quantile_seconds"
+            header(name, "gauge", family + "_quantile")
+            for q, value in zip(QUANTILES, quantiles):
+                lines.append(f"{name}{_labels(labels + (('quantile', q),))} {value:.6f}")
+
+        for (family, labels), value in counters:
+            name = f"{p}_{family}"
+            header(name, "counter", family)
+            lines.append(f"{name}{_labels(labels)} {value}")
+
+        for collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception:
+                continue    # a broken collector must not break the scrape
+            for name, labels, value in samples:
+                full = f"{p}_{name}"
+                header(full, "gauge", name)
+                lines.append(f"{full}{_labels(tuple(sorted(labels.items())))} {value}")
+
+        return "\n".join(lines) + "\n"
+
+# Global instance
+metrics = MetricsRegistry()
+metrics.describe("stage_seconds", "Latency of hot-path stages (embedding, search, LLM, SQLite).")
+metrics.describe("stage_errors_total", "Failures per stage, including ones handled with a fallback.")
+metrics.describe("http_request_seconds", "End-to-end request latency per endpoint.")
+metrics.describe("http_responses_total", "Responses per endpoint and status code.")
+metrics.describe("llm_attempts_total", "LLM calls per model and outcome (ok, retryable, error).")
+metrics.describe("llm_rejected_total", "LLM calls refused before reaching the provider (circuit_open, rate_limited, deadline, concurrency).")
@@ -0,0 +1,208 @@
+"""
+Versioned schema migrations for the HMS database.
+
+The applied version is stored in SQLite's `PRAGMA user_version`. Each migration
+runs inside its own transaction together with the version bump, so a failed
+step leaves the schema at the last good version. Column additions are guarded
+so databases patched by the old `check_update_db/update_db.py` script upgrade
+cleanly.
+"""
+from src.logger import logger
+
+
+def _column_exists(cur, table, column):
+    cur.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cur.fetchall())
+
+
+def _add_column(cur, table, column, definition):
+    if not _column_exists(cur, table, column):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _create_base_tables(cur):
+    # Doctors Table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS doctors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            specialization TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            room TEXT,
+            fee TEXT
+        )
+    ''')
+
+    # Appointments Table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_name TEXT,
+            doctor_id INTEGER,
+            appointment_date TEXT,
+            time_slot TEXT,
+            status TEXT DEFAULT 'Confirmed',
+            FOREIGN KEY(doctor_id) REFERENCES doctors(id)
+        )
+    ''')
+
+
+def _add_contact_columns(cur):
+    _add_column(cur, "appointments", "email", "TEXT")
+    _add_column(cur, "appointments", "whatsapp", "TEXT")
+
+
+def _add_arrival_columns(cur):
+    # arrival_status tracks 'Pending', 'Arrived' or 'In-Consultation'
+    _add_column(cur, "appointments", "arrival_status", "TEXT DEFAULT 'Pending'")
+    _add_column(cur, "appointments", "arrival_time", "TEXT")
+
+
+def _add_hot_path_indexes(cur):
+    # /get_slots: equality on doctor_id + date + status; time_slot makes it covering
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date_status
+        ON appointments (doctor_id, appointment_date, status, time_slot)
+    ''')
+    # Appointment listings ordered by date
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_appointments_date
+        ON appointments (appointment_date)
+    ''')
+    # Specialty lookups (case-insensitive exact match)
+    cur.execute('''
+        CREATE INDEX IF NOT EXISTS idx_doctors_specialization
+        ON doctors (specialization COLLATE NOCASE)
+    ''')
+
+
+def _add_unique_slot_index(cur):
+    # Older rows may already double-book a slot; keep the earliest booking
+    cur.execute('''
+        UPDATE appointments SET status = 'Duplicate'
+        WHERE status = 'Confirmed' AND id NOT IN (
+            SELECT MIN(id) FROM appointments WHERE status = 'Confirmed'
+            GROUP BY doctor_id, appointment_date, time_slot
+        )
+    ''')
+    if cur.rowcount > 0:
+        logger.warning(f"Marked {cur.rowcount} double-booked appointments as 'Duplicate'.")
+    # A slot can hold only one confirmed booking
+    cur.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_appointments_confirmed_slot
+        ON appointments (doctor_id, appointment_date, time_slot)
+        WHERE status = 'Confirmed'
+    ''')
+
+
+def _add_stats_tables(cur):
+    # Row counts kept up to date by triggers so the dashboard reads two rows
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for table in ("appointments", "doctors"):
+        cur.execute(f"INSERT OR REPLACE INTO stats_counters (name, value) SELECT '{table}', COUNT(*) FROM {table}")
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_count_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE stats_counters SET value = value + 1 WHERE name = '{table}';
+            END
+        ''')
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_count_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE stats_counters SET value = value - 1 WHERE name = '{table}';
+            END
+        ''')
+
+    # AI query counts bucketed per day and endpoint
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS ai_query_stats (
+            day TEXT,
+            endpoint TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, endpoint)
+        )
+    ''')
+
+
+def _add_doctors_version_stamp(cur):
+    # Any write to doctors (add_doctor, sync_doctors.py) bumps the stamp that
+    # tells in-process doctor caches to reload
+    cur.execute("INSERT OR IGNORE INTO stats_counters (name, value) VALUES ('doctors_version', 1)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_doctors_version_{event.lower()} AFTER {event} ON doctors
+            BEGIN
+                UPDATE stats_counters SET value = value + 1 WHERE name = 'doctors_version';
+            END
+        ''')
+
+
+def _add_doctor_retirement(cur):
+    # sync_doctors.py retires doctors who left the roster instead of deleting
+    # them, so appointments keep a valid doctor_id; only active doctors are
+    # served by the directory and counted on the dashboard
+    _add_column(cur, "doctors", "active", "INTEGER NOT NULL DEFAULT 1")
+    cur.execute("DROP TRIGGER IF EXISTS trg_doctors_count_insert")
+    cur.execute("DROP TRIGGER IF EXISTS trg_doctors_count_delete")
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_doctors_count_insert AFTER INSERT ON doctors
+        WHEN NEW.active = 1
+        BEGIN
+            UPDATE stats_counters SET value = value + 1 WHERE name = 'doctors';
+        END
+    ''')
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_doctors_count_delete AFTER DELETE ON doctors
+        WHEN OLD.active = 1
+        BEGIN
+            UPDATE stats_counters SET value = value - 1 WHERE name = 'doctors';
+        END
+    ''')
+    cur.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_doctors_count_active AFTER UPDATE OF active ON doctors
+        WHEN NEW.active != OLD.active
+        BEGIN
+            UPDATE stats_counters SET value = value + NEW.active - OLD.active WHERE name = 'doctors';
+        END
+    ''')
+    cur.execute("UPDATE stats_counters SET value = (SELECT COUNT(*) FROM doctors WHERE active = 1) WHERE name = 'doctors'")
+
+
+# (version, description, step) — append only, never renumber.
+MIGRATIONS = [
+    (1, "create doctors and appointments tables", _create_base_tables),
+    (2, "add appointment email/whatsapp columns", _add_contact_columns),
+    (3, "add appointment arrival tracking columns", _add_arrival_columns),
+    (4, "add hot-path indexes", _add_hot_path_indexes),
+    (5, "enforce one confirmed booking per slot", _add_unique_slot_index),
+    (6, "add materialized dashboard counters", _add_stats_tables),
+    (7, "add doctors version stamp", _add_doctors_version_stamp),
+    (8, "retire doctors instead of deleting them", _add_doctor_retirement),
+]
+
+
+def get_schema_version(db):
+    """Returns the schema version recorded in the database."""
+    return db.fetch_one("PRAGMA user_version")[0]
+
+
+def apply_migrations(db):
+    """Applies every pending migration in order and returns the resulting schema version."""
+    current = get_schema_version(db)
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with db.write() as cur:
+            # DDL does not open an implicit transaction, so begin one explicitly
+            cur.execute("BEGIN")
+            step(cur)
+            cur.execute(f"PRAGMA user_version = {version}")
+        logger.info(f"Applied schema migration {version}: {description}")
+        current = version
+    return current
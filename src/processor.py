@@ -1,6 +1,6 @@
 import os
 from src.logger import logger
-from langchain_community.document_loaders import PyPDFDirectoryLoader
+from src.loader import MedicalLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 class MedicalDocumentProcessor:
@@ -10,6 +10,21 @@ class MedicalDocumentProcessor:
     """
     def __init__(self, data_path: str = "data/"):
         self.data_path = data_path
+        # Chunk size 1000 with 100 overlap is ideal for medical context retention
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=100,
+            add_start_index=True
+        )
+
+    def split_documents(self, documents):
+        """Splits loaded pages into chunks with the pipeline's standard settings."""
+        return self.text_splitter.split_documents(documents)
+
+    def iter_chunks(self, pages):
+        """Lazily splits a stream of page Documents, one page at a time."""
+        for page in pages:
+            yield from self.text_splitter.split_documents([page])
 
     def process_documents(self):
         """
@@ -23,23 +38,25 @@ class MedicalDocumentProcessor:
                 logger.error(f"Data directory not found: {self.data_path}")
                 return []
 
-            loader = PyPDFDirectoryLoader(self.data_path)
-            raw_docs = loader.load()
-            
-            logger.info(f"Loaded {len(raw_docs)} raw pages from PDF files.")
-
-            # 2. Split Documents into Chunks
-            # Chunk size 1000 with 100 overlap is ideal for medical context retention
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=100,
-                add_start_index=True
+            loader = MedicalLoader(self.data_path)
+            pdf_paths = sorted(
+                os.path.join(root, name)
+                for root, _, files in os.walk(self.data_path)
+                for name in files if name.lower().endswith(".pdf")
             )
-            
-            final_chunks = text_splitter.split_documents(raw_docs)
+            page_count = 0
+
+            def counted(pages):
+                nonlocal page_count
+                for page in pages:
+                    page_count += 1
+                    yield page
+
+            # 2. Parse (process pool) and split pages as they arrive
+            final_chunks = list(self.iter_chunks(counted(loader.iter_pages(pdf_paths))))
             
             logger.info(f"Document splitting complete. Total chunks created: {len(final_chunks)}")
-            print(f"✅ Processed {len(raw_docs)} pages into {len(final_chunks)} chunks.")
+            print(f"✅ Processed {page_count} pages into {len(final_chunks)} chunks.")
             
             return final_chunks
 
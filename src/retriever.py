@@ -1,48 +1,134 @@
+import asyncio
 import os
-from src.logger import logger
+import threading
+import time
+from src.logger import get_logger
+from src.metrics import metrics
+
+logger = get_logger("retriever")
 
 class MedicalRAGRetriever:
     """
-    Handles retrieval of relevant medical context from the Pinecone vector database.
+    Handles retrieval of relevant medical context from the vector database.
+
+    When a BM25 `lexical_index` is attached, dense and keyword results are
+    combined with reciprocal-rank fusion, so exact drug names and lab codes
+    that MiniLM handles poorly still surface. Dense hits below `min_score`
+    (cosine, RETRIEVAL_MIN_SCORE) and keyword hits below `bm25_min_ratio` of
+    the best keyword score are dropped first, so the LLM gets fewer but
+    better chunks.
+
+    The vector store may be None (e.g. Pinecone unreachable at startup):
+    retrieval then returns no documents, and `connect()`, when given, is
+    retried at most every `reconnect_interval` seconds.
     """
-    def __init__(self, vectorstore):
-        # Vectorstore object is initialized and passed from app.py
+    def __init__(self, vectorstore, lexical_index=None, min_score: float = None,
+                 bm25_min_ratio: float = 0.5, rrf_k: int = 60, candidates: int = 20,
+                 connect=None, reconnect_interval: float = 30.0):
+        # Vectorstore object is initialized and passed from the service registry
         self.vectorstore = vectorstore
+        self.connect = connect
+        self.reconnect_interval = reconnect_interval
+        self._next_connect = 0.0
+        self._connect_lock = threading.Lock()
+        self.lexical_index = lexical_index
+        self.min_score = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.3")) if min_score is None else min_score
+        self.bm25_min_ratio = bm25_min_ratio
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+
+    def _reconnect(self):
+        """Retries `connect()` while the vector store is unavailable, throttled across threads."""
+        if self.connect is None or time.monotonic() < self._next_connect:
+            return
+        with self._connect_lock:
+            if self.vectorstore is not None or time.monotonic() < self._next_connect:
+                return
+            self._next_connect = time.monotonic() + self.reconnect_interval
+            try:
+                self.vectorstore = self.connect()
+                logger.info("Vector store reconnected.")
+            except Exception as e:
+                logger.warning(f"Vector store still unavailable: {e}")
+
+    @staticmethod
+    def _doc_key(doc):
+        return doc.id or (doc.metadata.get("source"), doc.metadata.get("page"),
+                          doc.metadata.get("start_index"), doc.page_content[:64])
+
+    def _dense(self, query, k, query_embedding):
+        with metrics.timer("vector_search"):
+            results = self._vector_search(query, k, query_embedding)
+        return [doc for doc, score in results if score >= self.min_score]
+
+    def _vector_search(self, query, k, query_embedding):
+        if query_embedding is not None and hasattr(self.vectorstore, "similarity_search_by_vector_with_score"):
+            return self.vectorstore.similarity_search_by_vector_with_score(list(map(float, query_embedding)), k=k)
+        return self.vectorstore.similarity_search_with_score(query, k=k)
+
+    def _lexical(self, query, k):
+        if self.lexical_index is None:
+            return []
+        with metrics.timer("bm25_search"):
+            results = self.lexical_index.search(query, k=k)
+        if not results:
+            return []
+        floor = results[0][1] * self.bm25_min_ratio
+        return [doc for doc, score in results if score >= floor]
 
-    def retrieve(self, query: str, top_k: int = 3):
+    def _fuse(self, ranked_lists, top_k):
+        """Reciprocal-rank fusion: score = sum of 1 / (rrf_k + rank) over the lists a chunk appears in."""
+        scores, docs = {}, {}
+        for ranked in ranked_lists:
+            for rank, doc in enumerate(ranked, start=1):
+                key = self._doc_key(doc)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank)
+                docs.setdefault(key, doc)
+        best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+        return [docs[key] for key in best]
+
+    def retrieve(self, query: str, top_k: int = 3, query_embedding=None):
         """
         Retrieves the top K most relevant medical document chunks based on user query.
+        Pass `query_embedding` when the query is already embedded to skip re-embedding it.
+        May return fewer than K chunks when the rest fall below the relevance cutoff.
         """
-        logger.info(f"Initiating retrieval for query: '{query}'")
-        
         try:
             # 1. Validation: Ensure vectorstore is properly connected
+            if self.vectorstore is None:
+                self._reconnect()
             if self.vectorstore is None:
                 logger.error("Retrieval Failed: VectorStore object is None. Verify Pinecone connection.")
                 return []
 
-            # 2. Vector Search: Perform similarity search with confidence scores
-            # Higher scores indicate better document relevance
-            results = self.vectorstore.similarity_search_with_score(query, k=top_k)
-            
-            if not results:
-                logger.warning(f"No matching medical documents found for: '{query}'")
+            # 2. Dense + keyword candidates, each already cut at its relevance floor
+            hybrid = self.lexical_index is not None and len(self.lexical_index) > 0
+            k = max(top_k, self.candidates) if hybrid else top_k
+            dense = self._dense(query, k, query_embedding)
+            lexical = self._lexical(query, k)
+
+            # 3. Fusion
+            retrieved_docs = self._fuse([dense, lexical], top_k)
+            if not retrieved_docs:
+                logger.warning(f"No medical documents above the relevance cutoff for: '{query}'")
                 return []
 
-            # 3. Data Processing
-            retrieved_docs = []
-            for doc, score in results:
-                # Optional: Filter by score threshold if needed (e.g., score > 0.1)
-                logger.info(f"Matched chunk with relevance score: {score}")
-                retrieved_docs.append(doc)
-            
-            logger.info(f"Successfully retrieved {len(retrieved_docs)} medical context chunks.")
+            logger.info(f"Retrieved {len(retrieved_docs)} chunks "
+                        f"({len(dense)} dense / {len(lexical)} keyword candidates).")
             return retrieved_docs
 
         except Exception as e:
+            metrics.error("retrieval")
             logger.error(f"Critical Retrieval Error: {str(e)}", exc_info=True)
             return []
 
+    async def aretrieve(self, query: str, top_k: int = 3, query_embedding=None):
+        """
+        Async variant of retrieve for the asyncio pipeline. The vector-store
+        client is blocking, so the search runs on a worker thread.
+        """
+        return await asyncio.to_thread(self.retrieve, query, top_k, query_embedding)
+
 # --- Manual Debugging Block ---
 if __name__ == "__main__":
     print("Direct execution disabled. Please run via app.py or 'python -m src.retriever'")
\ No newline at end of file
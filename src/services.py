@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from src.logger import logger
+
+class ServiceRegistry:
+    """
+    Lazily created, shared singletons for the expensive HMS services
+    (embedding model, vector store, Groq engine, answer cache).
+
+    Nothing is built at import time: the first `get(name)` runs the factory,
+    concurrent callers wait for that one build, and everyone shares the
+    result. A failed build is recorded and retried on the next `get`.
+    `warm_up()` builds services on a background thread so the app can serve
+    non-AI pages while models load; `status()` feeds the /healthz endpoint.
+    """
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self._status = {}       # name -> {"ready", "seconds", "error"}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory):
+        with self._lock:
+            self._factories[name] = factory
+            self._locks[name] = threading.Lock()
+            self._status[name] = {"ready": False, "seconds": None, "error": None}
+
+    def is_ready(self, name) -> bool:
+        return name in self._instances
+
+    def get(self, name):
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._factories:
+            raise KeyError(f"Unknown service '{name}'")
+
+        with self._locks[name]:
+            if name in self._instances:
+                return self._instances[name]
+            start = time.perf_counter()
+            try:
+                instance = self._factories[name]()
+            except Exception as e:
+                self._status[name].update(error=str(e), seconds=round(time.perf_counter() - start, 3))
+                logger.error(f"Service '{name}' failed to start: {e}")
+                raise
+            self._instances[name] = instance
+            self._status[name].update(ready=True, error=None, seconds=round(time.perf_counter() - start, 3))
+            logger.info(f"Service '{name}' ready in {self._status[name]['seconds']}s.")
+            return instance
+
+    def warm_up(self, names=None, background=True):
+        """Builds `names` (default: all registered services), on a daemon thread unless background=False."""
+        names = list(names or self._factories)
+
+        def build_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    pass    # already logged; /healthz reports it
+
+        if not background:
+            build_all()
+            return None
+        thread = threading.Thread(target=build_all, name="services-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        with self._lock:
+            return {name: dict(s) for name, s in self._status.items()}
+
+    def ready(self) -> bool:
+        return all(self.is_ready(name) for name in self._factories)
+
+# --- Factories (imports are local so importing this module stays cheap) ---
+
+def _build_embeddings():
+    from src.embeddings import MedicalEmbeddingManager
+    from src.triage import symptom_triage
+
+    embeddings = MedicalEmbeddingManager().get_embeddings()
+    symptom_triage.attach_embeddings(embeddings)
+    return embeddings
+
+def _build_vectorstore():
+    from src.vector_store import MedicalVectorManager
+    manager = MedicalVectorManager(embedding_model=services.get("embeddings"))
+    vectorstore = manager.get_vectorstore_object()
+    # The manager reports connection errors by returning None; raising keeps
+    # /healthz at 503 and lets the next get() retry the connection
+    if vectorstore is None:
+        raise RuntimeError(f"Vector store ({manager.backend}) is not connected.")
+    return vectorstore
+
+def _build_lexical_index():
+    from src.lexical_index import BM25Index
+    return BM25Index()
+
+def _build_retriever():
+    from src.retriever import MedicalRAGRetriever
+
+    # Pinecone being down must not take /chat down: start without the vector
+    # store (answers get an empty context) and let the retriever reconnect
+    try:
+        vectorstore = services.get("vectorstore")
+    except Exception:
+        vectorstore = None
+    return MedicalRAGRetriever(vectorstore, lexical_index=services.get("lexical_index"),
+                               connect=lambda: services.get("vectorstore"))
+
+def _build_ai_brain():
+    from src.ai_engine import MedicalAIEngine
+    return MedicalAIEngine()
+
+def _build_answer_cache():
+    from src.answer_cache import SemanticAnswerCache
+    from src.vector_store import read_index_version
+
+    # Repeated / near-duplicate questions skip retrieval and the LLM entirely
+    return SemanticAnswerCache(
+        services.get("embeddings"),
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+        ttl_seconds=int(os.getenv("ANSWER_CACHE_TTL", "3600")),
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92")),
+        index_version_fn=read_index_version
+    )
+
+def _build_slot_grids():
+    from src.slot_engine import slot_engine
+
+    # Precompute every doctor's slot grid once
+    slot_engine.load_all_doctors()
+    return slot_engine
+
+# Global instance
+services = ServiceRegistry()
+services.register("slot_engine", _build_slot_grids)
+services.register("embeddings", _build_embeddings)
+services.register("vectorstore", _build_vectorstore)
+services.register("lexical_index", _build_lexical_index)
+services.register("retriever", _build_retriever)
+services.register("answer_cache", _build_answer_cache)
+services.register("ai_brain", _build_ai_brain)
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive with the same key while it is running (followers) wait and share
+    its result or exception. Nothing is cached once the call finishes.
+    Threads use `do()`, coroutines use `ado()`; the two do not share flights
+    because asyncio futures are bound to one event loop.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self._stats["leaders"] += 1
+            else:
+                leader = False
+                self._stats["followers"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def ado(self, key, coro_fn):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            future = self._async_calls.get((loop, key))
+            if future is None:
+                future = self._async_calls[(loop, key)] = loop.create_future()
+                leader = True
+                self._stats["leaders"] += 1
+            else:
+                leader = False
+                self._stats["followers"] += 1
+
+        if not leader:
+            # shield: a cancelled follower must not cancel the shared call
+            return await asyncio.shield(future)
+
+        try:
+            result = await coro_fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not reported twice
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                del self._async_calls[(loop, key)]
+
+    def stats(self):
+        with self._lock:
+            total = self._stats["leaders"] + self._stats["followers"]
+            return {
+                **self._stats,
+                "in_flight": len(self._calls) + len(self._async_calls),
+                "coalescing_rate": round(self._stats["followers"] / total, 4) if total else 0.0,
+            }
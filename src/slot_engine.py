@@ -0,0 +1,179 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from src.database_manager import db_manager
+from src.doctor_directory import doctor_directory
+from src.logger import logger
+
+SLOT_MINUTES = 20
+TIME_FORMAT = "%I:%M %p"
+
+def _doctor_key(doctor_id):
+    """Frontend sends ids as strings; SQLite stores them as integers."""
+    try:
+        return int(doctor_id)
+    except (TypeError, ValueError):
+        return None
+
+def build_slot_grid(start_str, end_str, minutes=SLOT_MINUTES):
+    """Divides working hours into fixed booking intervals (e.g. '10:00 AM', '10:20 AM', ...)."""
+    slots = []
+    try:
+        start_dt = datetime.strptime(start_str.strip(), TIME_FORMAT)
+        end_dt = datetime.strptime(end_str.strip(), TIME_FORMAT)
+
+        step = timedelta(minutes=minutes)
+        current = start_dt
+        while current + step <= end_dt:
+            slots.append(current.strftime(TIME_FORMAT))
+            current += step
+    except Exception as e:
+        logger.error(f"Slot Generation Error for {start_str}-{end_str}: {e}")
+    return slots
+
+class SlotAvailabilityEngine:
+    """
+    Serves /get_slots from memory.
+
+    Each doctor's slot grid is computed once. Bookings for a (doctor, date)
+    pair are kept as an integer bitmap over that grid (bit i set = slot i
+    booked); the bitmap is read from SQLite on first access and afterwards
+    updated in place by bookings and deletions. The SQLite read runs
+    outside the lock, so a cache miss never stalls lookups for other days;
+    a result that a concurrent change may have made stale is served but not
+    cached.
+    """
+    def __init__(self, max_days=5000):
+        self._lock = threading.Lock()
+        self._grids = {}                    # doctor_id -> (slots tuple, {slot: index})
+        self._occupancy = OrderedDict()     # (doctor_id, date) -> bitmap
+        self._changes = {}                  # doctor_id -> count of bookings / grid changes
+        self._generation = 0                # bumped by invalidate_all
+        self.max_days = max_days
+
+    # --- Doctor grids ---
+
+    def load_doctor(self, doctor_id, start_time, end_time):
+        """Precomputes a doctor's slot grid, replacing any previous one."""
+        doctor_id = _doctor_key(doctor_id)
+        slots = tuple(build_slot_grid(start_time, end_time))
+        with self._lock:
+            self._grids[doctor_id] = (slots, {s: i for i, s in enumerate(slots)})
+            self._drop_occupancy(doctor_id)
+
+    def load_all_doctors(self):
+        """Builds grids for every doctor in the directory."""
+        rows = doctor_directory.all()
+        for row in rows:
+            self.load_doctor(row[0], row[3], row[4])
+        logger.info(f"Slot engine loaded grids for {len(rows)} doctors.")
+
+    def on_directory_reload(self, old_by_id, new_by_id):
+        """Drops grids of doctors whose hours changed or who were removed."""
+        for doctor_id, old in old_by_id.items():
+            new = new_by_id.get(doctor_id)
+            if new is None or (new[3], new[4]) != (old[3], old[4]):
+                self.invalidate_doctor(doctor_id)
+
+    def invalidate_doctor(self, doctor_id):
+        """Forgets a doctor's grid and bitmaps; call when their hours change."""
+        doctor_id = _doctor_key(doctor_id)
+        with self._lock:
+            self._grids.pop(doctor_id, None)
+            self._drop_occupancy(doctor_id)
+
+    def invalidate_all(self):
+        with self._lock:
+            self._grids.clear()
+            self._occupancy.clear()
+            self._generation += 1
+
+    def _changed(self, doctor_id):
+        """Marks in-flight bitmap reads for the doctor as possibly stale. Caller holds the lock."""
+        self._changes[doctor_id] = self._changes.get(doctor_id, 0) + 1
+
+    def _epoch(self, doctor_id):
+        return self._generation, self._changes.get(doctor_id, 0)
+
+    def _drop_occupancy(self, doctor_id):
+        self._changed(doctor_id)
+        for key in [k for k in self._occupancy if k[0] == doctor_id]:
+            del self._occupancy[key]
+
+    def _grid(self, doctor_id):
+        # Reading through the directory also applies any pending doctor-hours invalidation
+        doctor = doctor_directory.get(doctor_id)
+        if doctor is None:
+            return None
+        grid = self._grids.get(doctor_id)
+        if grid is None:
+            self.load_doctor(doctor_id, doctor[3], doctor[4])
+            grid = self._grids.get(doctor_id)
+        return grid
+
+    # --- Occupancy ---
+
+    def _bitmap(self, doctor_id, apt_date, index):
+        """Returns the cached bitmap, reading it from SQLite (without holding the lock) on a miss."""
+        key = (doctor_id, apt_date)
+        with self._lock:
+            bitmap = self._occupancy.get(key)
+            if bitmap is not None:
+                self._occupancy.move_to_end(key)
+                return bitmap
+            epoch = self._epoch(doctor_id)
+
+        bitmap = 0
+        rows = db_manager.fetch_all(
+            "SELECT time_slot FROM appointments WHERE doctor_id=? AND appointment_date=? AND status='Confirmed'",
+            (doctor_id, apt_date)
+        )
+        for (slot,) in rows:
+            i = index.get(slot)
+            if i is not None:
+                bitmap |= 1 << i
+        with self._lock:
+            # A booking or grid change for this doctor during the read may be
+            # missing from it: serve it to this caller but let the next one re-read
+            if self._epoch(doctor_id) == epoch and key not in self._occupancy:
+                self._occupancy[key] = bitmap
+                if len(self._occupancy) > self.max_days:
+                    self._occupancy.popitem(last=False)
+        return bitmap
+
+    def get_availability(self, doctor_id, apt_date):
+        """Returns [{'time', 'is_booked'}, ...] for the day, or None for an unknown doctor."""
+        doctor_id = _doctor_key(doctor_id)
+        if doctor_id is None:
+            return None
+        grid = self._grid(doctor_id)
+        if grid is None:
+            return None
+        slots, index = grid
+        bitmap = self._bitmap(doctor_id, apt_date, index)
+        return [{"time": s, "is_booked": bool(bitmap >> i & 1)} for i, s in enumerate(slots)]
+
+    def _set(self, doctor_id, apt_date, slot, booked):
+        doctor_id = _doctor_key(doctor_id)
+        key = (doctor_id, apt_date)
+        with self._lock:
+            self._changed(doctor_id)
+            grid = self._grids.get(doctor_id)
+            i = grid[1].get(slot) if grid else None
+            # Days that were never loaded are read fresh from SQLite on first access
+            if i is None or key not in self._occupancy:
+                return
+            if booked:
+                self._occupancy[key] |= 1 << i
+            else:
+                self._occupancy[key] &= ~(1 << i)
+
+    def mark_booked(self, doctor_id, apt_date, slot):
+        self._set(doctor_id, apt_date, slot, True)
+
+    def mark_free(self, doctor_id, apt_date, slot):
+        self._set(doctor_id, apt_date, slot, False)
+
+# Global instance
+slot_engine = SlotAvailabilityEngine()
+doctor_directory.add_listener(slot_engine.on_directory_reload)
@@ -0,0 +1,246 @@
+import asyncio
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from src.answer_cache import normalize_query
+from src.doctor_directory import doctor_directory, normalize
+from src.logger import get_logger
+from src.metrics import metrics
+
+logger = get_logger("triage")
+
+# Symptom vocabulary per specialty family, keyed by a stem of the specialty name.
+# A doctor's specialization picks up every family whose stem it contains, so
+# 'Pediatric Neurologist' matches both 'pediatric' and 'neurolog'.
+SPECIALTY_KEYWORDS = {
+    "cardio": ["heart", "chest pain", "chest tightness", "palpitation", "palpitations", "blood pressure",
+               "hypertension", "bp", "breathless on exertion", "irregular heartbeat", "angina", "cholesterol"],
+    "dermat": ["skin", "rash", "itching", "itch", "acne", "pimples", "eczema", "psoriasis", "hair fall",
+               "hair loss", "mole", "allergy on skin", "hives", "dandruff", "pigmentation"],
+    "nephro": ["kidney", "renal", "dialysis", "creatinine", "swelling in feet", "protein in urine",
+               "foamy urine", "kidney stone"],
+    "endocrin": ["diabetes", "sugar", "thyroid", "insulin", "hormone", "weight gain", "goiter",
+                 "excessive thirst", "frequent urination"],
+    "gyn": ["pregnancy", "pregnant", "period", "periods", "menstrual", "pcos", "vaginal", "uterus",
+            "ovary", "pelvic pain", "menopause", "infertility"],
+    "pediatric": ["child", "children", "baby", "infant", "kid", "toddler", "newborn", "my son", "my daughter"],
+    "internal medicine": ["fever", "flu", "cough", "cold", "weakness", "fatigue", "body ache", "typhoid",
+                          "infection", "vomiting", "diarrhea", "general checkup"],
+    "surgeon": ["gallbladder", "gallstone", "hernia", "appendix", "appendicitis", "surgery", "lump",
+                "abdominal pain", "piles"],
+    "psychiat": ["anxiety", "depression", "stress", "panic", "insomnia", "can't sleep", "mood", "suicidal",
+                 "hallucination", "ocd", "bipolar"],
+    "neurolog": ["headache", "migraine", "seizure", "seizures", "fits", "epilepsy", "numbness", "dizziness",
+                 "stroke", "paralysis", "tremor", "memory loss"],
+}
+
+# Qualifier families: a specialty carrying one of these stems is only a
+# candidate when the symptoms mention that family (an adult headache is not
+# pediatric), and when they do, only such specialties are candidates.
+REQUIRED_STEMS = ("pediatric",)
+QUALIFIER_PATTERNS = [re.compile(rf"\b{re.escape(kw)}\b")
+                      for stem in REQUIRED_STEMS for kw in SPECIALTY_KEYWORDS[stem]]
+
+class SymptomTriage:
+    """
+    Maps symptoms to a specialty without calling the LLM.
+
+    Specialty profiles are built from the specializations in the doctor
+    directory. A keyword pass scores each specialty; when it is not decisive
+    and embeddings are attached, the symptoms are compared against
+    precomputed specialty-profile embeddings. Only when both are unsure does
+    `recommend()` call the LLM. Results (local or LLM) are kept in an LRU
+    keyed by the normalized symptoms.
+    """
+    def __init__(self, embeddings=None, min_similarity=0.35, min_margin=0.05,
+                 min_keyword_score=2, min_keyword_margin=1, cache_size=1024):
+        self.embeddings = embeddings
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.min_keyword_score = min_keyword_score
+        self.min_keyword_margin = min_keyword_margin
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._profiles = None       # specialty -> (symptom keyword regexes, required qualifier regexes)
+        self._spec_names = []
+        self._spec_matrix = None
+        self.stats = {"cache_hits": 0, "keyword": 0, "embedding": 0, "llm": 0, "llm_failed": 0}
+
+    def attach_embeddings(self, embeddings):
+        with self._lock:
+            self.embeddings = embeddings
+            self._profiles = None
+
+    def on_directory_reload(self, old_by_id, new_by_id):
+        """Specialties may have changed; rebuild profiles and forget cached results."""
+        with self._lock:
+            self._profiles = None
+            self._cache.clear()
+
+    # --- Profiles ---
+
+    def _build_profiles(self, rows):
+        specialties = sorted({r[2] for r in rows if r[2]})
+        profiles, descriptions = {}, []
+        for spec in specialties:
+            key = normalize(spec)
+            keywords = [kw for stem, words in SPECIALTY_KEYWORDS.items() if stem in key for kw in words]
+            symptoms = [re.compile(rf"\b{re.escape(kw)}\b") for stem, words in SPECIALTY_KEYWORDS.items()
+                        if stem in key and stem not in REQUIRED_STEMS for kw in words]
+            required = [re.compile(rf"\b{re.escape(kw)}\b")
+                        for stem in REQUIRED_STEMS if stem in key for kw in SPECIALTY_KEYWORDS[stem]]
+            profiles[spec] = (symptoms, required)
+            descriptions.append(f"{spec}: {', '.join(keywords)}" if keywords else spec)
+
+        matrix = None
+        if self.embeddings is not None and specialties:
+            try:
+                vectors = np.asarray(self.embeddings.embed_documents(descriptions), dtype=np.float32)
+                matrix = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            except Exception as e:
+                logger.warning(f"Triage profile embedding failed, using keywords only: {e}")
+
+        self._profiles, self._spec_names, self._spec_matrix = profiles, specialties, matrix
+        logger.info(f"Triage profiles built for {len(specialties)} specialties.")
+
+    def _ensure_profiles(self):
+        if self._profiles is not None:
+            return
+        # Read the directory before locking: a reload calls our listener, which locks too
+        rows = doctor_directory.all()
+        with self._lock:
+            if self._profiles is None:
+                self._build_profiles(rows)
+
+    # --- Classification ---
+
+    def _by_keywords(self, text):
+        """
+        Picks a specialty only on a clear keyword win: at least `min_keyword_score`
+        symptom matches and `min_keyword_margin` more than the runner-up.
+        """
+        qualified = any(p.search(text) for p in QUALIFIER_PATTERNS)
+        if qualified:
+            # 'my baby has fever' is for a pediatric specialty, never an adult one
+            candidates = {spec: patterns for spec, (patterns, required) in self._profiles.items()
+                          if any(p.search(text) for p in required)}
+            if not candidates:
+                return None     # no specialty for this patient group: let the LLM decide
+        else:
+            candidates = {spec: patterns for spec, (patterns, required) in self._profiles.items()
+                          if not required}
+
+        ranked = sorted(((sum(1 for p in patterns if p.search(text)), spec)
+                         for spec, patterns in candidates.items()), reverse=True)
+        if not ranked:
+            return None
+        best, specialty = ranked[0]
+        runner_up = ranked[1][0] if len(ranked) > 1 else 0
+        if best >= self.min_keyword_score and best - runner_up >= self.min_keyword_margin:
+            return specialty
+        if qualified and best == 0:
+            # No sub-specialty symptom matched: the general one (e.g. 'Pediatrician') fits
+            general = [spec for spec, patterns in candidates.items() if not patterns]
+            if len(general) == 1:
+                return general[0]
+        return None
+
+    def _by_embedding(self, symptoms):
+        if self._spec_matrix is None:
+            return None
+        try:
+            vec = np.asarray(self.embeddings.embed_query(symptoms), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Triage query embedding failed: {e}")
+            return None
+        sims = self._spec_matrix @ (vec / (np.linalg.norm(vec) or 1.0))
+        order = np.argsort(sims)[::-1]
+        best = sims[order[0]]
+        runner_up = sims[order[1]] if len(order) > 1 else -1.0
+        if best >= self.min_similarity and best - runner_up >= self.min_margin:
+            return self._spec_names[int(order[0])]
+        return None
+
+    def classify(self, symptoms: str):
+        """Returns (specialty, method) from the local classifier, or (None, None) when unsure."""
+        with metrics.timer("triage_local"):
+            return self._classify(symptoms)
+
+    def _classify(self, symptoms):
+        self._ensure_profiles()
+        text = normalize(symptoms)
+        specialty = self._by_keywords(text)
+        if specialty:
+            return specialty, "keyword"
+        specialty = self._by_embedding(symptoms)
+        if specialty and any(p.search(text) for p in QUALIFIER_PATTERNS) \
+                and not any(p.search(text) for p in self._profiles[specialty][1]):
+            specialty = None    # an adult specialty for a child: leave it to the LLM
+        if specialty:
+            return specialty, "embedding"
+        return None, None
+
+    def recommend(self, symptoms: str, llm_fallback):
+        """
+        Returns a specialty (or, from the LLM fallback, a doctor name) for the symptoms.
+        `llm_fallback(symptoms)` is called only when the local classifier is unsure.
+        """
+        key = normalize_query(symptoms)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return self._cache[key]
+
+        result, method = self.classify(symptoms)
+        if result is None:
+            result, method = llm_fallback(symptoms), "llm"
+            if result is None:
+                # LLM unavailable: not cached, so the next request asks again
+                with self._lock:
+                    self.stats["llm_failed"] += 1
+                return None
+        logger.info(f"Triage via {method}: {result}")
+
+        with self._lock:
+            self.stats[method] += 1
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    async def arecommend(self, symptoms: str, allm_fallback, local_result=None):
+        """
+        Async variant of recommend(). `allm_fallback(symptoms)` is awaited only
+        when the local classifier is unsure; pass `local_result` (from
+        `classify`) when it was already computed concurrently with other work.
+        """
+        key = normalize_query(symptoms)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return self._cache[key]
+
+        result, method = local_result or await asyncio.to_thread(self.classify, symptoms)
+        if result is None:
+            result, method = await allm_fallback(symptoms), "llm"
+            if result is None:
+                # LLM unavailable: not cached, so the next request asks again
+                with self._lock:
+                    self.stats["llm_failed"] += 1
+                return None
+        logger.info(f"Triage via {method}: {result}")
+
+        with self._lock:
+            self.stats[method] += 1
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+# Global instance
+symptom_triage = SymptomTriage()
+doctor_directory.add_listener(symptom_triage.on_directory_reload)
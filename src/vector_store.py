@@ -1,15 +1,67 @@
 import os
+import time
 from dotenv import load_dotenv
-from pinecone import Pinecone as PineconeClient
-from langchain_pinecone import PineconeVectorStore
 
 load_dotenv()
 
+# Touched after every ingestion so caches keyed on index contents can reset
+INDEX_STAMP_PATH = os.getenv("VECTOR_INDEX_STAMP", os.path.join("data", ".index_version"))
+
+def read_index_version():
+    """Returns the current index version stamp (its mtime), or 0 if never ingested."""
+    try:
+        return os.stat(INDEX_STAMP_PATH).st_mtime_ns
+    except OSError:
+        return 0
+
+def bump_index_version():
+    """Marks the vector index as re-ingested."""
+    os.makedirs(os.path.dirname(INDEX_STAMP_PATH) or ".", exist_ok=True)
+    with open(INDEX_STAMP_PATH, "w") as f:
+        f.write(str(time.time_ns()))
+
 class MedicalVectorManager:
-    def __init__(self, embedding_model):
+    """
+    Owns the vector store used for RAG retrieval.
+
+    The backend is chosen by VECTOR_BACKEND: 'pinecone' (default, needs
+    network and API keys) or 'local' (memory-mapped index under
+    LOCAL_VECTOR_PATH, fully offline). Both expose the same LangChain
+    VectorStore interface to the retriever.
+    """
+    BACKENDS = ("pinecone", "local")
+
+    def __init__(self, embedding_model, backend: str = None):
+        self.embeddings = embedding_model
+        self.backend = (backend or os.getenv("VECTOR_BACKEND", "pinecone")).lower()
+        self.vectorstore = None
+
+        if self.backend not in self.BACKENDS:
+            print(f"❌ Unknown VECTOR_BACKEND '{self.backend}'. Use one of: {', '.join(self.BACKENDS)}")
+        elif self.backend == "local":
+            self._connect_local()
+        else:
+            self._connect_pinecone()
+
+    def _connect_local(self):
+        from src.local_vector_store import LocalVectorStore
+
+        self.local_path = os.getenv("LOCAL_VECTOR_PATH", "vector_index")
+        try:
+            self.vectorstore = LocalVectorStore(self.embeddings, path=self.local_path)
+            print(f"✅ Local Vector Index: {self.local_path}")
+            print(f"📊 Total Vectors in Database: {len(self.vectorstore)}")
+        except Exception as e:
+            print(f"❌ Local Index Failed: {str(e)}")
+            self.vectorstore = None
+
+    def _connect_pinecone(self):
+        # Imported here so the local backend runs without the Pinecone packages
+        from pinecone import Pinecone as PineconeClient
+        from langchain_pinecone import PineconeVectorStore
+
         self.api_key = os.getenv("PINECONE_API_KEY")
         self.index_name = os.getenv("PINECONE_INDEX_NAME")
-        self.embeddings = embedding_model
         
         try:
             # Direct Connection
@@ -35,6 +87,19 @@ class MedicalVectorManager:
     def get_vectorstore_object(self):
         return self.vectorstore
 
+    def add_documents(self, chunks, **kwargs):
+        """Upserts document chunks and bumps the index version stamp."""
+        ids = self.vectorstore.add_documents(chunks, **kwargs)
+        bump_index_version()
+        return ids
+
+    def delete(self, ids):
+        """Removes vectors by id and bumps the index version stamp."""
+        if not ids:
+            return
+        self.vectorstore.delete(ids=list(ids))
+        bump_index_version()
+
 # Isolated Testing Block (FIXED)
 if __name__ == "__main__":
     # Jab direct run karein to local import use karein
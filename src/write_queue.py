@@ -0,0 +1,110 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from src.database_manager import db_manager
+from src.logger import logger
+from src.metrics import metrics
+
+class GroupCommitWriter:
+    """
+    Single-writer queue that group-commits request writes.
+
+    Routes submit a callable `op(cursor)`; a background thread collects every
+    op queued within `max_delay` seconds (up to `max_batch`) and runs them in
+    one transaction, so a burst of bookings costs one commit instead of one
+    per request. Each op runs inside its own SAVEPOINT: if it raises (e.g. a
+    UNIQUE violation on a double-booking) only that op is rolled back and the
+    exception is delivered through its future.
+    """
+    def __init__(self, db, max_delay=0.005, max_batch=64):
+        self.db = db
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="hms-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, op):
+        """Queues `op(cursor)` and returns a Future with its result."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((op, future))
+        return future
+
+    def run(self, op, timeout=10.0):
+        """
+        Queues `op(cursor)` and blocks until its batch has committed.
+
+        If `timeout` passes before the op has started it is cancelled and
+        TimeoutError is raised, so it can never commit after the caller gave
+        up; once it is running, the wait continues until its batch commits.
+        """
+        # Includes the group-commit wait, i.e. what the request actually feels
+        with metrics.timer("db_write_queue"):
+            future = self.submit(op)
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeout:
+                if future.cancel():
+                    logger.warning(f"Queued write cancelled after waiting {timeout}s for the writer.")
+                    raise
+                # Already inside a transaction: report its real outcome
+                return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            results = []
+            try:
+                with self.db.write() as cur:
+                    cur.execute("BEGIN")
+                    for op, future in batch:
+                        if not future.set_running_or_notify_cancel():
+                            continue
+                        cur.execute("SAVEPOINT op")
+                        try:
+                            results.append((future, op(cur), None))
+                            cur.execute("RELEASE op")
+                        except Exception as e:
+                            cur.execute("ROLLBACK TO op")
+                            cur.execute("RELEASE op")
+                            results.append((future, None, e))
+            except Exception as e:
+                # Commit itself failed: nothing in the batch was persisted
+                logger.error(f"Group commit failed for {len(batch)} writes: {e}")
+                for op, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            # Results are released only after the commit is durable
+            for future, result, error in results:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+# Global instance
+write_queue = GroupCommitWriter(db_manager)
@@ -25,17 +25,21 @@ async function sendMessage() {
     scrollToBottom();
 
     try {
-        const response = await fetch('/chat', {
+        // Streamed as Server-Sent Events; render each token as it arrives
+        const response = await fetch('/chat/stream', {
             method: 'POST',
             headers: {'Content-Type': 'application/json'},
             body: JSON.stringify({ query: query })
         });
         
-        const data = await response.json();
         const aiDiv = document.getElementById(loadingId);
-        
-        // Format and display the RAG response
-        aiDiv.innerHTML = formatMedicalOutput(data.response);
+        let answer = "";
+        await readChatStream(response, token => {
+            answer += token;
+            // Format and display the RAG response
+            aiDiv.innerHTML = formatMedicalOutput(answer);
+            scrollToBottom();
+        });
         
     } catch (error) {
         document.getElementById(loadingId).innerHTML = "❌ Error: Could not reach the medical server.";
@@ -146,6 +150,30 @@ function confirmBooking(docName, time) {
 
 // --- 3. UTILITIES ---
 
+// Reads a /chat/stream SSE body and calls onToken for every token message
+async function readChatStream(response, onToken) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const dataLine = message.split("\n").find(line => line.startsWith("data: "));
+            if (!dataLine || message.startsWith("event: done")) continue;
+
+            const payload = JSON.parse(dataLine.slice(6));
+            if (payload.token) onToken(payload.token);
+        }
+    }
+}
+
 function formatMedicalOutput(text) {
     if (!text) return "No response generated.";
     return text
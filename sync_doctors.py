@@ -1,40 +1,158 @@
+import argparse
 import csv
 import os
+import re
+import time
+from datetime import datetime
 from src.database_manager import db_manager
+from src.doctor_directory import normalize
+from src.slot_engine import TIME_FORMAT
 from src.logger import logger
 
-def sync_csv_to_sql(file_path):
-    """Reads doctor data from CSV and populates the SQL database."""
+# Titles are not part of the key, so 'Dr. X' -> 'Prof. Dr. X' is an update, not a new doctor
+TITLES = {"dr", "prof", "professor", "mr", "mrs", "ms", "miss"}
+
+FIELDS = ("name", "specialization", "start_time", "end_time", "room", "fee")
+
+class RosterError(ValueError):
+    """A CSV row that cannot be imported."""
+
+class _DryRun(Exception):
+    pass
+
+def doctor_key(name):
+    """Stable natural key for a doctor: the name's words without titles, e.g. 'syed mohsin naveed'."""
+    return " ".join(t for t in re.findall(r"[a-z0-9]+", normalize(name)) if t not in TITLES)
+
+def parse_row(row):
+    """CSV dict -> (name, specialization, start_time, end_time, room, fee)."""
+    name = (row.get('Doctor Name') or "").strip()
+    if not doctor_key(name):
+        raise RosterError("missing doctor name")
+    start, sep, end = (row.get('Available Time') or "").partition('-')
+    start, end = start.strip(), end.strip()
+    try:
+        datetime.strptime(start, TIME_FORMAT)
+        datetime.strptime(end, TIME_FORMAT)
+    except ValueError:
+        raise RosterError(f"bad 'Available Time' {row.get('Available Time')!r}")
+    return (name, (row.get('Specialization') or "").strip(), start, end,
+            (row.get('Room No') or "").strip(), (row.get('Fee') or "").strip())
+
+def iter_roster(file_path):
+    """Streams (line number, key, record or RosterError) from the CSV without loading it whole."""
+    with open(file_path, mode='r', encoding='utf-8', newline='') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            try:
+                record = parse_row(row)
+            except RosterError as e:
+                yield reader.line_num, doctor_key(row.get('Doctor Name') or ""), e
+                continue
+            yield reader.line_num, doctor_key(record[0]), record
+
+def sync_csv_to_sql(file_path, dry_run=False, max_retire_fraction=0.5):
+    """
+    Makes the doctors table match the CSV roster in one transaction.
+
+    Rows are matched by `doctor_key` (the name without titles): new doctors
+    are inserted, changed ones updated in place (keeping their id, so
+    appointments stay attached), and doctors missing from the CSV are
+    retired (active = 0) rather than deleted. Rows that fail validation
+    keep the existing doctor untouched. The sync is refused if it would
+    retire more than `max_retire_fraction` of the active doctors (a
+    truncated file, usually). Returns a report of what changed.
+    """
     if not os.path.exists(file_path):
         print(f"❌ Error: {file_path} not found!")
-        return
+        return None
 
+    start = time.perf_counter()
+    report = {"inserted": [], "updated": [], "reactivated": [], "retired": [],
+              "unchanged": 0, "invalid": [], "duplicates": []}
     try:
-        with open(file_path, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            
-            # Clear existing data to avoid duplicates (Optional)
-            db_manager.cursor.execute("DELETE FROM doctors")
-            
-            count = 0
-            for row in reader:
-                db_manager.add_doctor(
-                    name=row['Doctor Name'],
-                    spec=row['Specialization'],
-                    start=row['Available Time'].split('-')[0].strip(),
-                    end=row['Available Time'].split('-')[1].strip(),
-                    room=row['Room No'],
-                    fee=row['Fee']
-                )
-                count += 1
-            
-            logger.info(f"Successfully synced {count} doctors to the database.")
-            print(f"✅ Success: {count} doctors imported to SQL database.")
+        with db_manager.write() as cur:
+            # Reserve the writer up front so the diff and the writes see the same table
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute(f"SELECT id, {', '.join(FIELDS)}, active FROM doctors ORDER BY id")
+            current = {}
+            extra_ids = []      # rows whose key is already taken by a lower id
+            for row in cur.fetchall():
+                key = doctor_key(row[1])
+                if key in current:
+                    extra_ids.append(row)
+                else:
+                    current[key] = row
+
+            inserts, updates, seen = [], [], set()
+            for line, key, record in iter_roster(file_path):
+                if isinstance(record, RosterError):
+                    report["invalid"].append(f"line {line}: {record}")
+                    seen.add(key)       # an unreadable row never retires anyone
+                    continue
+                if key in seen:
+                    report["duplicates"].append(f"line {line}: {record[0]}")
+                    continue
+                seen.add(key)
 
+                existing = current.get(key)
+                if existing is None:
+                    inserts.append(record)
+                    report["inserted"].append(record[0])
+                elif tuple(existing[1:7]) != record or not existing[7]:
+                    updates.append((*record, existing[0]))
+                    report["reactivated" if not existing[7] else "updated"].append(record[0])
+                else:
+                    report["unchanged"] += 1
+
+            retire = [row for key, row in current.items() if key not in seen and row[7]]
+            retire += [row for row in extra_ids if row[7]]
+            active = sum(1 for row in current.values() if row[7]) + sum(1 for row in extra_ids if row[7])
+            if active and len(retire) > max_retire_fraction * active:
+                raise RuntimeError(f"refusing to retire {len(retire)} of {active} active doctors "
+                                   f"(limit {max_retire_fraction:.0%}); check the CSV or raise --max-retire")
+            report["retired"] = [row[1] for row in retire]
+
+            cur.executemany(f"INSERT INTO doctors ({', '.join(FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)", inserts)
+            cur.executemany('''
+                UPDATE doctors SET name = ?, specialization = ?, start_time = ?, end_time = ?,
+                                   room = ?, fee = ?, active = 1
+                WHERE id = ?
+            ''', updates)
+            cur.executemany("UPDATE doctors SET active = 0 WHERE id = ?", [(row[0],) for row in retire])
+            if dry_run:
+                raise _DryRun()
+    except _DryRun:
+        pass
     except Exception as e:
         logger.error(f"Sync Error: {str(e)}")
-        print(f"❌ Sync Failed: {e}")
+        print(f"❌ Sync Failed (nothing changed): {e}")
+        return None
+
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    # Running app servers pick this up through the doctors_version stamp;
+    # this only refreshes caches inside the current process
+    db_manager.doctors_changed()
+    summary = (f"{len(report['inserted'])} added, {len(report['updated'])} updated, "
+               f"{len(report['reactivated'])} reactivated, {len(report['retired'])} retired, "
+               f"{report['unchanged']} unchanged, {len(report['invalid'])} invalid rows "
+               f"in {report['seconds']}s")
+    if not dry_run:
+        logger.info(f"Doctor roster synced: {summary}.")
+    print(f"{'🔎 Dry run' if dry_run else '✅ Success'}: {summary}.")
+    for label in ("inserted", "updated", "reactivated", "retired", "invalid", "duplicates"):
+        for item in report[label][:20]:
+            print(f"   {label:<12} {item}")
+        if len(report[label]) > 20:
+            print(f"   {label:<12} ... and {len(report[label]) - 20} more")
+    return report
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the doctors table with a CSV roster.")
     # Ensure your file name matches here
-    sync_csv_to_sql("doctors_data.csv")
\ No newline at end of file
+    parser.add_argument("csv", nargs="?", default="doctors_data.csv")
+    parser.add_argument("--dry-run", action="store_true", help="report the changes without applying them")
+    parser.add_argument("--max-retire", type=float, default=0.5,
+                        help="largest fraction of active doctors one sync may retire")
+    args = parser.parse_args()
+    sync_csv_to_sql(args.csv, dry_run=args.dry_run, max_retire_fraction=args.max_retire)